@@ -1,17 +1,47 @@
+import argparse
+import io
+import numpy as np
 import pandas as pd
-import random
 import json
-from faker import Faker
-from datetime import datetime
+import shutil
+import sys
+from datetime import date, datetime
+from multiprocessing import Pool
 import yaml
 from pathlib import Path
 
-fake = Faker()
-
 BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.data_generation.value_pools import load_pools, pick, pool_settings, unique_emails
+from scripts.data_generation.workload_profiles import choose_keys, choose_offsets, resolve_profile
+from scripts.ingestion.ingest_to_staging import TABLES as STAGING_TABLES
+from scripts.ingestion.ingest_to_staging import copy_csv, get_connection, prepare_table
+from scripts.ingestion.compression import COMPRESSIONS, open_raw, with_compression
 RAW_DATA_DIR = BASE_DIR / "data" / "raw"
 CONFIG_PATH = BASE_DIR / "config" / "config.yaml"
 
+AGE_GROUPS = np.array(["18-25", "26-35", "36-45", "46-60", "60+"], dtype=object)
+CATEGORIES = {
+    "Electronics": ["Mobile", "Laptop", "Accessories"],
+    "Clothing": ["Men", "Women", "Kids"],
+    "Home & Kitchen": ["Appliances", "Decor"],
+    "Books": ["Fiction", "Education"],
+    "Sports": ["Outdoor", "Indoor"],
+    "Beauty": ["Skincare", "Makeup"]
+}
+PAYMENT_METHODS = np.array(["Credit Card", "Debit Card", "UPI", "Cash on Delivery", "Net Banking"], dtype=object)
+DISCOUNT_CHOICES = np.array([0, 5, 10, 15])
+MAX_ITEMS_PER_TRANSACTION = 5
+MAX_QUANTITY = 4
+DEFAULT_CHUNK_SIZE = 100_000
+TABLES = ("customers", "products", "transactions", "transaction_items")
+
+# Each chunk draws from its own seeded stream, so the output depends only on
+# the seed and chunk size, never on how many workers produced it
+SEED_STREAMS = {"customers": 0, "products": 1, "transactions": 2, "item_counts": 3}
+
 
 # ---------------- CONFIG LOADER ----------------
 def load_config():
@@ -20,131 +50,170 @@ def load_config():
 
 
 # ---------------- DATA GENERATION ----------------
-def generate_customers(num_customers: int) -> pd.DataFrame:
-    customers = []
-    used_emails = set()
-
-    for i in range(1, num_customers + 1):
-        email = fake.email()
-        while email in used_emails:
-            email = fake.email()
-        used_emails.add(email)
-
-        customers.append({
-            "customer_id": f"CUST{i:04d}",
-            "first_name": fake.first_name(),
-            "last_name": fake.last_name(),
-            "email": email,
-            "phone": fake.phone_number(),
-            "registration_date": fake.date_between(start_date="-3y", end_date="today"),
-            "city": fake.city(),
-            "state": fake.state(),
-            "country": fake.country(),
-            "age_group": random.choice(["18-25", "26-35", "36-45", "46-60", "60+"])
-        })
-
-    return pd.DataFrame(customers)
-
-
-def generate_products(num_products: int) -> pd.DataFrame:
-    categories = {
-        "Electronics": ["Mobile", "Laptop", "Accessories"],
-        "Clothing": ["Men", "Women", "Kids"],
-        "Home & Kitchen": ["Appliances", "Decor"],
-        "Books": ["Fiction", "Education"],
-        "Sports": ["Outdoor", "Indoor"],
-        "Beauty": ["Skincare", "Makeup"]
-    }
+def generate_customers(num_customers: int, start_id: int = 1, rng: np.random.Generator = None,
+                       as_of: date = None, pools: dict = None) -> pd.DataFrame:
+    rng = rng if rng is not None else np.random.default_rng()
+    as_of = as_of or date.today()
+    pools = pools if pools is not None else load_pools()
+
+    numbers = np.arange(start_id, start_id + num_customers)
+    first_idx = rng.integers(0, len(pools["first_names"]), num_customers)
+    last_idx = rng.integers(0, len(pools["last_names"]), num_customers)
+    days_back = rng.integers(0, 3 * 365 + 1, num_customers)
+
+    return pd.DataFrame({
+        "customer_id": format_ids("CUST", start_id, num_customers, 4),
+        "first_name": pools["first_names"][first_idx],
+        "last_name": pools["last_names"][last_idx],
+        "email": unique_emails(pools, rng, numbers, first_idx, last_idx),
+        "phone": pick(pools, "phones", rng, num_customers),
+        "registration_date": (pd.Timestamp(as_of) - pd.to_timedelta(days_back, unit="D")).date,
+        "city": pick(pools, "cities", rng, num_customers),
+        "state": pick(pools, "states", rng, num_customers),
+        "country": pick(pools, "countries", rng, num_customers),
+        "age_group": AGE_GROUPS[rng.integers(0, len(AGE_GROUPS), num_customers)]
+    })
+
+
+def generate_products(num_products: int, start_id: int = 1, rng: np.random.Generator = None,
+                      pools: dict = None) -> pd.DataFrame:
+    rng = rng if rng is not None else np.random.default_rng()
+    pools = pools if pools is not None else load_pools()
+
+    category_names = np.array(list(CATEGORIES), dtype=object)
+    category_idx = rng.integers(0, len(category_names), num_products)
+    sub_category_pick = rng.random(num_products)
+    categories = category_names[category_idx]
+    prices = np.round(rng.uniform(10, 500, num_products), 2)
+
+    return pd.DataFrame({
+        "product_id": format_ids("PROD", start_id, num_products, 4),
+        "product_name": pick(pools, "product_names", rng, num_products),
+        "category": categories,
+        "sub_category": [
+            CATEGORIES[category][int(p * len(CATEGORIES[category]))]
+            for category, p in zip(categories, sub_category_pick)
+        ],
+        "price": prices,
+        "cost": np.round(prices * rng.uniform(0.5, 0.8, num_products), 2),
+        "brand": pick(pools, "companies", rng, num_products),
+        "stock_quantity": rng.integers(0, 501, num_products),
+        "supplier_id": format_ids("SUP", 1, 50, 3)[rng.integers(0, 50, num_products)]
+    })
+
+
+def generate_transactions(num_transactions: int, customers_df: pd.DataFrame,
+                          rng: np.random.Generator = None, start_id: int = 1,
+                          as_of: date = None, pools: dict = None, profile: dict = None) -> pd.DataFrame:
+    rng = rng if rng is not None else np.random.default_rng()
+    pools = pools if pools is not None else load_pools()
+    profile = profile or {}
+    customer_ids = customers_df["customer_id"].to_numpy(dtype=object)
+
+    # Timestamps over the year up to now (or the end of as_of), at one-second resolution
+    if as_of is None:
+        end = pd.Timestamp.now().floor("s")
+    else:
+        end = pd.Timestamp(as_of) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    start = end - pd.Timedelta(days=365)
+    offsets = choose_offsets(profile.get("daily_volume"), start, end, rng, num_transactions)
+    txn_datetimes = pd.Series(start + pd.to_timedelta(offsets, unit="s"))
+
+    return pd.DataFrame({
+        "transaction_id": format_ids("TXN", start_id, num_transactions, 5),
+        "customer_id": customer_ids[
+            choose_keys(profile.get("customers"), len(customer_ids), rng, num_transactions)
+        ],
+        "transaction_date": txn_datetimes.dt.date,
+        "transaction_time": txn_datetimes.dt.time,
+        "payment_method": PAYMENT_METHODS[rng.integers(0, len(PAYMENT_METHODS), num_transactions)],
+        # Street x locality pairs give far more distinct addresses than either pool
+        "shipping_address": (pick(pools, "streets", rng, num_transactions) + ", "
+                             + pick(pools, "localities", rng, num_transactions))
+    })
+
+
+def generate_transaction_items(transactions_df: pd.DataFrame, products_df: pd.DataFrame,
+                               rng: np.random.Generator = None, start_id: int = 1,
+                               num_items: np.ndarray = None, profile: dict = None) -> pd.DataFrame:
+    rng = rng if rng is not None else np.random.default_rng()
+    profile = profile or {}
+    product_ids = products_df["product_id"].to_numpy(dtype=object)
+    prices = products_df["price"].to_numpy(dtype=float)
+    num_transactions = len(transactions_df)
+
+    # Every transaction draws up to the max picks; the first num_items are kept
+    max_items = min(MAX_ITEMS_PER_TRANSACTION, len(product_ids))
+    if num_items is None:
+        num_items = rng.integers(1, max_items + 1, num_transactions)
+    picks = sample_distinct(rng, len(product_ids), num_transactions, max_items, profile.get("products"))
+    product_idx = picks[np.arange(max_items) < num_items[:, None]]
+
+    num_rows = len(product_idx)
+    quantity = rng.integers(1, MAX_QUANTITY + 1, num_rows)
+    unit_price = prices[product_idx]
+    discount = DISCOUNT_CHOICES[rng.integers(0, len(DISCOUNT_CHOICES), num_rows)]
+    line_total = np.round(quantity * unit_price * (1 - discount / 100), 2)
+
+    return pd.DataFrame({
+        "item_id": format_ids("ITEM", start_id, num_rows, 5),
+        "transaction_id": np.repeat(transactions_df["transaction_id"].to_numpy(dtype=object), num_items),
+        "product_id": product_ids[product_idx],
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "discount_percentage": discount,
+        "line_total": line_total
+    })
+
+
+def calculate_total_amount(transactions: pd.DataFrame, items: pd.DataFrame) -> pd.DataFrame:
+    totals = (
+        items
+        .groupby("transaction_id", as_index=False)["line_total"]
+        .sum()
+        .rename(columns={"line_total": "total_amount"})
+    )
 
-    products = []
+    transactions = transactions.merge(totals, on="transaction_id", how="left")
+    transactions["total_amount"] = transactions["total_amount"].round(2)
+    return transactions
 
-    for i in range(1, num_products + 1):
-        category = random.choice(list(categories.keys()))
-        sub_category = random.choice(categories[category])
-        price = round(random.uniform(10, 500), 2)
-        cost = round(price * random.uniform(0.5, 0.8), 2)
-
-        products.append({
-            "product_id": f"PROD{i:04d}",
-            "product_name": fake.word().capitalize(),
-            "category": category,
-            "sub_category": sub_category,
-            "price": price,
-            "cost": cost,
-            "brand": fake.company(),
-            "stock_quantity": random.randint(0, 500),
-            "supplier_id": f"SUP{random.randint(1, 50):03d}"
-        })
-
-    return pd.DataFrame(products)
-
-
-def generate_transactions(num_transactions: int, customers_df: pd.DataFrame) -> pd.DataFrame:
-    transactions = []
-    customer_ids = customers_df["customer_id"].tolist()
-    payment_methods = ["Credit Card", "Debit Card", "UPI", "Cash on Delivery", "Net Banking"]
-
-    for i in range(1, num_transactions + 1):
-        txn_datetime = fake.date_time_between(start_date="-1y", end_date="now")
-
-        transactions.append({
-            "transaction_id": f"TXN{i:05d}",
-            "customer_id": random.choice(customer_ids),
-            "transaction_date": txn_datetime.date(),
-            "transaction_time": txn_datetime.time(),
-            "payment_method": random.choice(payment_methods),
-            "shipping_address": fake.address().replace("\n", ", ")
-        })
-
-    return pd.DataFrame(transactions)
-
-
-def generate_transaction_items(transactions_df: pd.DataFrame, products_df: pd.DataFrame) -> pd.DataFrame:
-    items = []
-    item_counter = 1
-
-    product_price_map = products_df.set_index("product_id")["price"].to_dict()
-
-    for _, txn in transactions_df.iterrows():
-        num_items = random.randint(1, 5)
-        chosen_products = random.sample(list(product_price_map.keys()), num_items)
-
-        for prod_id in chosen_products:
-            quantity = random.randint(1, 4)
-            unit_price = product_price_map[prod_id]
-            discount = random.choice([0, 5, 10, 15])
-
-            line_total = round(
-                quantity * unit_price * (1 - discount / 100),
-                2
-            )
-
-            items.append({
-                "item_id": f"ITEM{item_counter:05d}",
-                "transaction_id": txn["transaction_id"],
-                "product_id": prod_id,
-                "quantity": quantity,
-                "unit_price": unit_price,
-                "discount_percentage": discount,
-                "line_total": line_total
-            })
-            item_counter += 1
-
-    return pd.DataFrame(items)
 
+# ---------------- VECTOR HELPERS ----------------
+def format_ids(prefix: str, start_id: int, count: int, width: int) -> np.ndarray:
+    # str.format beats numpy's char routines by a wide margin for short ids
+    template = f"{prefix}{{:0{width}d}}"
+    return np.array(list(map(template.format, range(start_id, start_id + count))), dtype=object)
 
-# ---------------- VALIDATION ----------------
-def validate_referential_integrity(customers, products, transactions, items) -> dict:
-    issues = 0
 
-    if not set(transactions["customer_id"]).issubset(customers["customer_id"]):
-        issues += 1
+def sample_distinct(rng: np.random.Generator, population: int, rows: int, k: int,
+                    spec: dict = None) -> np.ndarray:
+    # k distinct indices per row (same as random.sample), drawn for all rows at once;
+    # a skewed spec makes this successive weighted sampling without replacement
+    picks = choose_keys(spec, population, rng, rows * k).reshape(rows, k)
+
+    # Redraw a column only where it repeats an earlier pick in the same row
+    for col in range(1, k):
+        redraw = np.flatnonzero((picks[:, :col] == picks[:, col:col + 1]).any(axis=1))
+        while redraw.size:
+            picks[redraw, col] = choose_keys(spec, population, rng, redraw.size)
+            clash = (picks[redraw, :col] == picks[redraw, col:col + 1]).any(axis=1)
+            redraw = redraw[clash]
 
-    if not set(items["transaction_id"]).issubset(transactions["transaction_id"]):
-        issues += 1
+    return picks
 
-    if not set(items["product_id"]).issubset(products["product_id"]):
-        issues += 1
+
+# ---------------- VALIDATION ----------------
+def find_orphans(customer_ids, product_ids, transactions, items) -> dict:
+    return {
+        "transactions_without_customers": not transactions["customer_id"].isin(customer_ids).all(),
+        "items_without_transactions": not items["transaction_id"].isin(transactions["transaction_id"]).all(),
+        "items_without_products": not items["product_id"].isin(product_ids).all()
+    }
+
+
+def summarize_integrity(orphans: dict) -> dict:
+    issues = sum(orphans.values())
 
     return {
         "orphan_records": issues,
@@ -153,55 +222,410 @@ def validate_referential_integrity(customers, products, transactions, items) ->
     }
 
 
-# ---------------- MAIN ----------------
-def main():
-    config = load_config()
-    RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
+def validate_referential_integrity(customers, products, transactions, items) -> dict:
+    orphans = find_orphans(customers["customer_id"], products["product_id"], transactions, items)
+    return summarize_integrity(orphans)
 
-    customers = generate_customers(config["data_generation"]["customers"])
-    products = generate_products(config["data_generation"]["products"])
-    transactions = generate_transactions(config["data_generation"]["transactions"], customers)
-    items = generate_transaction_items(transactions, products)
 
-    # ---- Calculate total_amount correctly ----
-    totals = (
-        items
-        .groupby("transaction_id", as_index=False)["line_total"]
-        .sum()
-        .rename(columns={"line_total": "total_amount"})
+# ---------------- CHUNK PLANNING ----------------
+def make_plan(config: dict, chunk_size: int, seed: int = None, as_of: date = None,
+              profile: str = None) -> dict:
+    gen_config = config["data_generation"]
+    seed = seed if seed is not None else gen_config.get("seed")
+    as_of = as_of or gen_config.get("as_of") or date.today()
+
+    return {
+        "seed": int(seed) if seed is not None else int(np.random.default_rng().integers(2 ** 63)),
+        "as_of": as_of if isinstance(as_of, date) else date.fromisoformat(str(as_of)),
+        "chunk_size": chunk_size,
+        "pools": pool_settings(config),
+        "profile": resolve_profile(config, profile),
+        "customers": gen_config["customers"],
+        "products": gen_config["products"],
+        "transactions": gen_config["transactions"]
+    }
+
+
+def chunk_ranges(total: int, chunk_size: int) -> list:
+    return [
+        (index, start, min(chunk_size, total - start + 1))
+        for index, start in enumerate(range(1, total + 1, chunk_size))
+    ]
+
+
+def chunk_rng(plan: dict, stream: str, index: int) -> np.random.Generator:
+    return np.random.default_rng([plan["seed"], SEED_STREAMS[stream], index])
+
+
+def draw_item_counts(plan: dict, index: int, count: int) -> np.ndarray:
+    max_items = min(MAX_ITEMS_PER_TRANSACTION, plan["products"])
+    return chunk_rng(plan, "item_counts", index).integers(1, max_items + 1, count)
+
+
+def plan_item_offsets(plan: dict) -> list:
+    # Item counts have their own stream, so every chunk's ITEM range is known up front
+    offsets, next_id = [], 1
+    for index, _, count in chunk_ranges(plan["transactions"], plan["chunk_size"]):
+        offsets.append(next_id)
+        next_id += int(draw_item_counts(plan, index, count).sum())
+    return offsets
+
+
+def build_customer_chunk(plan: dict, index: int, start_id: int, count: int) -> pd.DataFrame:
+    return generate_customers(count, start_id, chunk_rng(plan, "customers", index), plan["as_of"],
+                              load_pools(**plan["pools"]))
+
+
+def build_product_chunk(plan: dict, index: int, start_id: int, count: int) -> pd.DataFrame:
+    return generate_products(count, start_id, chunk_rng(plan, "products", index), load_pools(**plan["pools"]))
+
+
+def build_transaction_chunk(plan: dict, index: int, start_id: int, count: int,
+                            customer_ids: pd.DataFrame, products: pd.DataFrame, item_start: int):
+    rng = chunk_rng(plan, "transactions", index)
+    transactions = generate_transactions(count, customer_ids, rng, start_id, plan["as_of"],
+                                         load_pools(**plan["pools"]), plan["profile"])
+    items = generate_transaction_items(transactions, products, rng, item_start,
+                                       draw_item_counts(plan, index, count), plan["profile"])
+
+    # Each chunk owns whole transactions, so total_amount is final per chunk
+    return calculate_total_amount(transactions, items), items
+
+
+def plan_customer_ids(plan: dict) -> pd.DataFrame:
+    return pd.DataFrame({"customer_id": format_ids("CUST", 1, plan["customers"], 4)})
+
+
+def chunk_stats(customer_ids, product_ids, transactions, items) -> dict:
+    return {
+        "transactions": len(transactions),
+        "transaction_items": len(items),
+        "first_date": transactions["transaction_date"].min() if len(transactions) else None,
+        "last_date": transactions["transaction_date"].max() if len(transactions) else None,
+        "orphans": find_orphans(customer_ids, product_ids, transactions, items)
+    }
+
+
+def merge_stats(total: dict, stats: dict) -> dict:
+    first_dates = [d for d in (total.get("first_date"), stats["first_date"]) if d is not None]
+    last_dates = [d for d in (total.get("last_date"), stats["last_date"]) if d is not None]
+
+    return {
+        "transactions": total.get("transactions", 0) + stats["transactions"],
+        "transaction_items": total.get("transaction_items", 0) + stats["transaction_items"],
+        "first_date": min(first_dates, default=None),
+        "last_date": max(last_dates, default=None),
+        "orphans": {
+            check: total.get("orphans", {}).get(check, False) or failed
+            for check, failed in stats["orphans"].items()
+        }
+    }
+
+
+def plan_metadata(plan: dict, stats: dict, **settings) -> dict:
+    metadata = build_metadata(
+        {
+            "customers": plan["customers"],
+            "products": plan["products"],
+            "transactions": stats.get("transactions", 0),
+            "transaction_items": stats.get("transaction_items", 0)
+        },
+        stats.get("first_date"), stats.get("last_date"), summarize_integrity(stats.get("orphans", {}))
     )
+    metadata["generation_settings"] = {
+        "seed": plan["seed"],
+        "as_of": plan["as_of"].isoformat(),
+        "chunk_size": plan["chunk_size"],
+        "profile": plan["profile"],
+        **settings
+    }
+    return metadata
 
-    transactions = transactions.merge(totals, on="transaction_id", how="left")
-    transactions["total_amount"] = transactions["total_amount"].round(2)
 
-    # ---- Save CSVs ----
-    customers.to_csv(RAW_DATA_DIR / "customers.csv", index=False)
-    products.to_csv(RAW_DATA_DIR / "products.csv", index=False)
-    transactions.to_csv(RAW_DATA_DIR / "transactions.csv", index=False)
-    items.to_csv(RAW_DATA_DIR / "transaction_items.csv", index=False)
+# ---------------- SINKS ----------------
+# Appends chunk frames to one CSV per table, writing the header only once;
+# files stay open so a compressed output is a single stream
+class CsvSink:
+    def __init__(self, directory: Path, compression: str = None):
+        self.directory = directory
+        self.compression = compression
+        self.files = {}
+
+    def write(self, table: str, frame: pd.DataFrame):
+        first = table not in self.files
+        if first:
+            self.files[table] = open_raw(with_compression(self.directory / f"{table}.csv", self.compression), "wt")
+        frame.to_csv(self.files[table], header=first, index=False)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def abort(self):
+        self.close()
+
+
+# COPYs each chunk into its staging table from an in-memory buffer, skipping
+# the CSV round trip; the whole run is one transaction, as in ingest_to_staging
+class StagingSink:
+    def __init__(self, conn):
+        self.conn = conn
+        self.cur = conn.cursor()
+        self.started = set()
+
+    def write(self, table: str, frame: pd.DataFrame):
+        if table not in self.started:
+            prepare_table(self.cur, table, STAGING_TABLES[table])
+            self.started.add(table)
+
+        buffer = io.StringIO()
+        frame.to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        copy_csv(self.cur, table, frame.columns, buffer)
+
+    def close(self):
+        self.conn.commit()
+        self.cur.close()
+        self.conn.close()
+
+    def abort(self):
+        self.conn.rollback()
+        self.cur.close()
+        self.conn.close()
+
+
+class TeeSink:
+    def __init__(self, *sinks):
+        self.sinks = sinks
+
+    def write(self, table: str, frame: pd.DataFrame):
+        for sink in self.sinks:
+            sink.write(table, frame)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+    def abort(self):
+        for sink in self.sinks:
+            sink.abort()
+
+
+# ---------------- STREAMING ----------------
+
+
+def generate_streaming(config: dict, sink, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                       seed: int = None, as_of: date = None, profile: str = None) -> dict:
+    plan = make_plan(config, chunk_size, seed, as_of, profile)
+
+    # Dimensions are sized by their own settings; only product prices stay in memory
+    for index, start, count in chunk_ranges(plan["customers"], chunk_size):
+        sink.write("customers", build_customer_chunk(plan, index, start, count))
+
+    products = []
+    for index, start, count in chunk_ranges(plan["products"], chunk_size):
+        chunk = build_product_chunk(plan, index, start, count)
+        sink.write("products", chunk)
+        products.append(chunk[["product_id", "price"]])
+    products = pd.concat(products, ignore_index=True)
+
+    customer_ids = plan_customer_ids(plan)
+    stats = {}
+    item_start = 1
 
-    validation = validate_referential_integrity(customers, products, transactions, items)
+    for index, start, count in chunk_ranges(plan["transactions"], chunk_size):
+        transactions, items = build_transaction_chunk(plan, index, start, count,
+                                                      customer_ids, products, item_start)
+        sink.write("transactions", transactions)
+        sink.write("transaction_items", items)
 
-    metadata = {
+        stats = merge_stats(stats, chunk_stats(customer_ids["customer_id"], products["product_id"],
+                                               transactions, items))
+        item_start += len(items)
+
+    sink.close()
+    return plan_metadata(plan, stats, workers=1)
+
+
+# ---------------- SHARDED (MULTI-PROCESS) ----------------
+_WORKER = {}
+
+
+def _init_worker(plan: dict, shard_dir: Path = None, products: pd.DataFrame = None, compression: str = None):
+    _WORKER.update(plan=plan, shard_dir=shard_dir, products=products, compression=compression)
+    if products is not None:
+        _WORKER["customer_ids"] = plan_customer_ids(plan)
+
+
+def _write_shard(table: str, index: int, frame: pd.DataFrame):
+    # Without a shard directory the frame goes back to the parent's sink
+    if _WORKER["shard_dir"] is None:
+        return frame
+
+    # Only the first part carries a header, so merging is plain concatenation;
+    # gzip, bz2 and zstd streams concatenate too, so workers compress in parallel
+    path = with_compression(_WORKER["shard_dir"] / table / f"part-{index:05d}.csv", _WORKER["compression"])
+    with open_raw(path, "wt") as f:
+        frame.to_csv(f, header=index == 0, index=False)
+    return None
+
+
+def _customer_shard(task):
+    index, start, count = task
+    return _write_shard("customers", index, build_customer_chunk(_WORKER["plan"], index, start, count))
+
+
+def _product_shard(task):
+    index, start, count = task
+    chunk = build_product_chunk(_WORKER["plan"], index, start, count)
+    return _write_shard("products", index, chunk), chunk[["product_id", "price"]]
+
+
+def _transaction_shard(task):
+    index, start, count, item_start = task
+    customer_ids, products = _WORKER["customer_ids"], _WORKER["products"]
+
+    transactions, items = build_transaction_chunk(_WORKER["plan"], index, start, count,
+                                                  customer_ids, products, item_start)
+    stats = chunk_stats(customer_ids["customer_id"], products["product_id"], transactions, items)
+
+    return stats, {
+        "transactions": _write_shard("transactions", index, transactions),
+        "transaction_items": _write_shard("transaction_items", index, items)
+    }
+
+
+def merge_shards(shard_dir: Path, target: Path):
+    with open(target, "wb") as out:
+        for part in sorted(shard_dir.glob("part-*.csv*")):
+            with open(part, "rb") as f:
+                shutil.copyfileobj(f, out, 16 * 1024 * 1024)
+
+
+def generate_sharded(config: dict, workers: int, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     seed: int = None, as_of: date = None, output_dir: Path = RAW_DATA_DIR,
+                     sink=None, profile: str = None, compression: str = None) -> dict:
+    plan = make_plan(config, chunk_size, seed, as_of, profile)
+    load_pools(**plan["pools"])  # build or read the cache once, before workers fork
+
+    # With a sink, workers hand their frames back in chunk order instead of writing shards
+    shard_dir = None if sink is not None else output_dir / "shards"
+    if shard_dir is not None:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+        for table in TABLES:
+            (shard_dir / table).mkdir(parents=True)
+
+    with Pool(workers, initializer=_init_worker, initargs=(plan, shard_dir, None, compression)) as pool:
+        for chunk in pool.imap(_customer_shard, chunk_ranges(plan["customers"], chunk_size)):
+            if sink is not None:
+                sink.write("customers", chunk)
+
+        products = []
+        for chunk, prices in pool.imap(_product_shard, chunk_ranges(plan["products"], chunk_size)):
+            if sink is not None:
+                sink.write("products", chunk)
+            products.append(prices)
+        products = pd.concat(products, ignore_index=True)
+
+    tasks = [
+        (index, start, count, item_start)
+        for (index, start, count), item_start in zip(chunk_ranges(plan["transactions"], chunk_size),
+                                                     plan_item_offsets(plan))
+    ]
+
+    stats = {}
+    with Pool(workers, initializer=_init_worker, initargs=(plan, shard_dir, products, compression)) as pool:
+        for shard_stats, frames in pool.imap(_transaction_shard, tasks):
+            stats = merge_stats(stats, shard_stats)
+            if sink is not None:
+                sink.write("transactions", frames["transactions"])
+                sink.write("transaction_items", frames["transaction_items"])
+
+    if sink is not None:
+        sink.close()
+    else:
+        for table in TABLES:
+            merge_shards(shard_dir / table, Path(with_compression(output_dir / f"{table}.csv", compression)))
+        shutil.rmtree(shard_dir)
+
+    return plan_metadata(plan, stats, workers=workers, shards=len(tasks))
+
+
+# ---------------- METADATA ----------------
+def build_metadata(record_counts: dict, first_date, last_date, validation: dict) -> dict:
+    return {
         "generation_timestamp": datetime.utcnow().isoformat(),
-        "record_counts": {
-            "customers": len(customers),
-            "products": len(products),
-            "transactions": len(transactions),
-            "transaction_items": len(items)
-        },
+        "record_counts": record_counts,
         "date_range": {
-            "start": str(transactions["transaction_date"].min()),
-            "end": str(transactions["transaction_date"].max())
+            "start": str(first_date),
+            "end": str(last_date)
         },
         "data_quality": validation
     }
 
+
+def write_metadata(metadata: dict):
     with open(RAW_DATA_DIR / "generation_metadata.json", "w") as f:
         json.dump(metadata, f, indent=4)
 
-    print("✅ Data generation completed successfully.")
 
+# ---------------- MAIN ----------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate synthetic e-commerce data")
+    parser.add_argument("--stream", action="store_true",
+                        help="kept for compatibility: every run writes fixed-size chunks appended to disk")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="rows per chunk (default: data_generation.chunk_size)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="generate chunks on N processes and merge the shard files")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="base seed; the same seed, as-of date and chunk size give the same bytes")
+    parser.add_argument("--as-of", type=date.fromisoformat, default=None,
+                        help="last day of the generated date window (YYYY-MM-DD, default today)")
+    parser.add_argument("--profile", default=None,
+                        help="workload profile from data_generation.workload_profiles (default: data_generation.profile)")
+    parser.add_argument("--to-staging", action="store_true",
+                        help="COPY chunks straight into the staging tables instead of writing CSVs")
+    parser.add_argument("--tee-csv", action="store_true",
+                        help="with --to-staging, also write the CSV files")
+    parser.add_argument("--compress", choices=COMPRESSIONS, default=None,
+                        help="compress the CSV files (default: data_generation.compression)")
+    return parser.parse_args(argv)
+
+
+def build_sink(args, compression: str = None):
+    if not args.to_staging:
+        return None
+
+    sink = StagingSink(get_connection())
+    return TeeSink(sink, CsvSink(RAW_DATA_DIR, compression)) if args.tee_csv else sink
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = load_config()
+    RAW_DATA_DIR.mkdir(parents=True, exist_ok=True)
+
+    chunk_size = args.chunk_size or config["data_generation"].get("chunk_size", DEFAULT_CHUNK_SIZE)
+    compression = args.compress or config["data_generation"].get("compression", "none")
+
+    # Every run goes through the seeded chunk planner, so --seed and --as-of
+    # pin the output whatever the mode; one worker generates in-process
+    sink = build_sink(args, compression)
+    try:
+        if args.workers > 1:
+            metadata = generate_sharded(config, args.workers, chunk_size, args.seed, args.as_of,
+                                        sink=sink, profile=args.profile, compression=compression)
+        else:
+            metadata = generate_streaming(config, sink or CsvSink(RAW_DATA_DIR, compression), chunk_size,
+                                          args.seed, args.as_of, args.profile)
+    except Exception:
+        if sink is not None:
+            sink.abort()
+        raise
+
+    write_metadata(metadata)
+    print("✅ Data generation completed successfully.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,108 @@
+import json
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import faker
+import numpy as np
+from faker import Faker
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+CACHE_DIR = BASE_DIR / "data" / "cache"
+
+DEFAULT_POOL_SIZE = 20_000
+DEFAULT_POOL_SEED = 2024
+
+# One Faker call per pool entry; rows then pick from the pools by index
+POOL_FIELDS = {
+    "first_names": lambda f: f.first_name(),
+    "last_names": lambda f: f.last_name(),
+    "email_domains": lambda f: f.free_email_domain(),
+    "phones": lambda f: f.phone_number(),
+    "cities": lambda f: f.city(),
+    "states": lambda f: f.state(),
+    "countries": lambda f: f.country(),
+    "companies": lambda f: f.company(),
+    "words": lambda f: f.word(),
+    "streets": lambda f: f.street_address(),
+    "localities": lambda f: f"{f.city()}, {f.state_abbr()} {f.postcode()}",
+}
+
+
+# ---------------- BUILD ----------------
+def build_pools(size: int, seed: int) -> dict:
+    fake = Faker()
+    fake.seed_instance(seed)
+    return {name: [make(fake) for _ in range(size)] for name, make in POOL_FIELDS.items()}
+
+
+def cache_path(size: int, seed: int, cache_dir: Path) -> Path:
+    return Path(cache_dir) / f"value_pools_{size}_{seed}.json"
+
+
+def read_cache(path: Path):
+    if not path.exists():
+        return None
+
+    with open(path, "r") as f:
+        cached = json.load(f)
+
+    # Another Faker release can return different values for the same seed
+    if cached.get("faker_version") != faker.VERSION or set(cached["pools"]) != set(POOL_FIELDS):
+        return None
+    return cached["pools"]
+
+
+def write_cache(path: Path, pools: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+
+    with open(tmp_path, "w") as f:
+        json.dump({"faker_version": faker.VERSION, "pools": pools}, f)
+    tmp_path.replace(path)
+
+
+# ---------------- LOAD ----------------
+@lru_cache(maxsize=4)
+def load_pools(size: int = DEFAULT_POOL_SIZE, seed: int = DEFAULT_POOL_SEED, cache_dir: str = str(CACHE_DIR)) -> dict:
+    path = cache_path(size, seed, cache_dir)
+    raw = read_cache(path)
+
+    if raw is None:
+        raw = build_pools(size, seed)
+        write_cache(path, raw)
+
+    pools = {name: np.array(values, dtype=object) for name, values in raw.items()}
+
+    # Email local parts reuse the picked name, so they are prepared alongside it
+    pools["email_first_names"] = np.array([email_part(v) for v in raw["first_names"]], dtype=object)
+    pools["email_last_names"] = np.array([email_part(v) for v in raw["last_names"]], dtype=object)
+    pools["product_names"] = np.array([v.capitalize() for v in raw["words"]], dtype=object)
+    return pools
+
+
+def pool_settings(config: dict) -> dict:
+    settings = config["data_generation"].get("value_pools") or {}
+    return {
+        "size": int(settings.get("size", DEFAULT_POOL_SIZE)),
+        "seed": int(settings.get("seed", DEFAULT_POOL_SEED)),
+        "cache_dir": str(BASE_DIR / settings["cache_dir"]) if settings.get("cache_dir") else str(CACHE_DIR)
+    }
+
+
+# ---------------- PICKING ----------------
+def email_part(value: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", value.lower())
+
+
+def pick(pools: dict, name: str, rng: np.random.Generator, count: int) -> np.ndarray:
+    values = pools[name]
+    return values[rng.integers(0, len(values), count)]
+
+
+def unique_emails(pools: dict, rng: np.random.Generator, numbers: np.ndarray,
+                  first_idx: np.ndarray, last_idx: np.ndarray) -> np.ndarray:
+    # first.last + customer number is unique by construction, so no retry loop is needed
+    domains = pick(pools, "email_domains", rng, len(numbers))
+    locals_ = pools["email_first_names"][first_idx] + "." + pools["email_last_names"][last_idx]
+    return locals_ + numbers.astype(str).astype(object) + "@" + domains
@@ -0,0 +1,83 @@
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+UNIFORM_PROFILE = {
+    "customers": {"distribution": "uniform"},
+    "products": {"distribution": "uniform"},
+    "daily_volume": {"distribution": "uniform"}
+}
+
+SECONDS_PER_DAY = 86_400
+
+
+# ---------------- PROFILE LOOKUP ----------------
+def resolve_profile(config: dict, name: str = None) -> dict:
+    gen_config = config["data_generation"]
+    name = name or gen_config.get("profile", "uniform")
+    profiles = gen_config.get("workload_profiles") or {}
+
+    if name == "uniform" and name not in profiles:
+        return UNIFORM_PROFILE
+    if name not in profiles:
+        raise ValueError(f"Unknown workload profile '{name}', expected one of {sorted(profiles)}")
+
+    return {**UNIFORM_PROFILE, **profiles[name]}
+
+
+def is_uniform(spec) -> bool:
+    return spec is None or spec.get("distribution", "uniform") == "uniform"
+
+
+# ---------------- KEY SKEW ----------------
+@lru_cache(maxsize=16)
+def zipf_table(population: int, exponent: float, hot_key_seed: int):
+    # Rank r has weight 1 / r^s; ranks are scattered over the id range so the
+    # hot keys are not simply the lowest ids
+    weights = 1.0 / np.arange(1, population + 1) ** exponent
+    cdf = np.cumsum(weights)
+    cdf /= cdf[-1]
+    ranks_to_keys = np.random.default_rng(hot_key_seed).permutation(population)
+    return cdf, ranks_to_keys
+
+
+def choose_keys(spec, population: int, rng: np.random.Generator, size: int) -> np.ndarray:
+    if is_uniform(spec):
+        return rng.integers(0, population, size)
+
+    if spec["distribution"] != "zipf":
+        raise ValueError(f"Unsupported key distribution '{spec['distribution']}'")
+
+    cdf, ranks_to_keys = zipf_table(population, float(spec.get("exponent", 1.1)), int(spec.get("hot_key_seed", 0)))
+    ranks = np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), population - 1)
+    return ranks_to_keys[ranks]
+
+
+# ---------------- DAILY VOLUME ----------------
+@lru_cache(maxsize=16)
+def seasonal_cdf(first_day: pd.Timestamp, num_days: int, weekday_weights: tuple, month_weights: tuple):
+    days = pd.date_range(first_day, periods=num_days, freq="D")
+    weights = np.asarray(weekday_weights)[days.dayofweek] * np.asarray(month_weights)[days.month - 1]
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def choose_offsets(spec, start: pd.Timestamp, end: pd.Timestamp, rng: np.random.Generator, size: int) -> np.ndarray:
+    span = int((end - start).total_seconds())
+    if is_uniform(spec):
+        return rng.integers(0, span + 1, size)
+
+    if spec["distribution"] != "seasonal":
+        raise ValueError(f"Unsupported daily volume distribution '{spec['distribution']}'")
+
+    # Pick a calendar day by weekday x month weight, then a uniform time within it
+    first_day = start.normalize()
+    num_days = (end.normalize() - first_day).days + 1
+    cdf = seasonal_cdf(first_day, num_days,
+                       tuple(spec.get("weekday_weights", [1.0] * 7)),
+                       tuple(spec.get("month_weights", [1.0] * 12)))
+
+    days = np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), num_days - 1)
+    seconds = days * SECONDS_PER_DAY + rng.integers(0, SECONDS_PER_DAY, size)
+    return np.clip(seconds - int((start - first_day).total_seconds()), 0, span)
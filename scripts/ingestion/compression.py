@@ -0,0 +1,67 @@
+import bz2
+import gzip
+import io
+import os
+
+# zstd is optional; gzip and bz2 ship with Python
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUFFIXES = {"gzip": ".gz", "bz2": ".bz2", "zstd": ".zst"}
+COMPRESSIONS = ("none",) + tuple(SUFFIXES)
+
+
+def compression_of(path) -> str:
+    for name, suffix in SUFFIXES.items():
+        if str(path).endswith(suffix):
+            return name
+    return None
+
+
+def with_compression(path, compression: str = None) -> str:
+    if compression in (None, "none"):
+        return str(path)
+    if compression not in SUFFIXES:
+        raise ValueError(f"Unknown compression '{compression}', expected one of {COMPRESSIONS}")
+    return str(path) + SUFFIXES[compression]
+
+
+def require_zstd():
+    if zstandard is None:
+        raise ImportError("zstd files need the 'zstandard' package: pip install zstandard")
+
+
+# Opens plain or compressed files by suffix. Reads decompress as a stream, so
+# callers see ordinary bytes/text with no temp file in between
+def open_raw(path, mode: str = "rb"):
+    compression = compression_of(path)
+
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        return gzip.open(path, mode)
+    if compression == "bz2":
+        return bz2.open(path, mode)
+
+    require_zstd()
+    if "r" in mode:
+        # Appended chunks and merged shards are separate frames, so read across them
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True)
+        stream = io.BufferedReader(stream)
+    else:
+        stream = zstandard.ZstdCompressor().stream_writer(open(path, mode.replace("t", "").rstrip("b") + "b"))
+
+    return stream if "b" in mode else io.TextIOWrapper(stream, encoding="utf-8", newline="")
+
+
+# A table's raw file may have been dropped plain or compressed; take the newest
+def find_raw_file(directory, file_name: str) -> str:
+    candidates = [os.path.join(directory, file_name)]
+    candidates += [with_compression(candidates[0], name) for name in SUFFIXES]
+    existing = [path for path in candidates if os.path.exists(path)]
+
+    if not existing:
+        return candidates[0]
+    return max(existing, key=os.path.getmtime)
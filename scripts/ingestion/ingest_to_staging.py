@@ -1,6 +1,27 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
 import psycopg2
-import csv
+import yaml
+from psycopg2.pool import ThreadedConnectionPool
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.ingestion.binary_copy import BinaryCopyStream, encoders_for
+from scripts.ingestion.compression import compression_of, find_raw_file, open_raw
+from scripts.quality_checks.pre_ingest_validation import CLEAN_DIR, validate_raw_files
 
 DB_CONFIG = {
     "host": "localhost",
@@ -11,10 +32,35 @@ DB_CONFIG = {
 }
 
 DATA_PATH = "data/raw"
+SUMMARY_PATH = "data/staging/ingestion_summary.json"
+MANIFEST_PATH = "data/staging/ingestion_manifest.json"
+CONFIG_PATH = BASE_DIR / "config" / "config.yaml"
+
+COPY_FORMATS = ("csv", "binary")
+LOAD_MODES = ("direct", "shadow", "upsert")
+DEFAULT_UPSERT_BATCH_ROWS = 100_000
+COPY_BUFFER_SIZE = 1024 * 1024
+DEFAULT_SPLIT_MB = 256
+FINGERPRINT_BYTES = 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
 
+CHECKPOINT_DDL = """
+    CREATE TABLE IF NOT EXISTS public.ingestion_checkpoints (
+        table_name VARCHAR PRIMARY KEY,
+        file_fingerprint VARCHAR NOT NULL,
+        byte_offset BIGINT NOT NULL,
+        rows_loaded BIGINT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# loaded_at is when ingestion last wrote the row (COPY fills the default);
+# the fact loader only re-signs the transaction dates of rows newer than
+# its ledger, through the loaded_at and transaction_date indexes
 TABLES = {
     "customers": {
         "file": "customers.csv",
+        "key": "customer_id",
         "ddl": """
             CREATE TABLE IF NOT EXISTS public.customers (
                 customer_id VARCHAR PRIMARY KEY,
@@ -26,12 +72,15 @@ TABLES = {
                 city VARCHAR,
                 state VARCHAR,
                 country VARCHAR,
-                age_group VARCHAR
+                age_group VARCHAR,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+            ALTER TABLE public.customers ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
         """
     },
     "products": {
         "file": "products.csv",
+        "key": "product_id",
         "ddl": """
             CREATE TABLE IF NOT EXISTS public.products (
                 product_id VARCHAR PRIMARY KEY,
@@ -42,12 +91,15 @@ TABLES = {
                 cost NUMERIC,
                 brand VARCHAR,
                 stock_quantity INTEGER,
-                supplier_id VARCHAR
+                supplier_id VARCHAR,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+            ALTER TABLE public.products ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
         """
     },
     "transactions": {
         "file": "transactions.csv",
+        "key": "transaction_id",
         "ddl": """
             CREATE TABLE IF NOT EXISTS public.transactions (
                 transaction_id VARCHAR PRIMARY KEY,
@@ -56,12 +108,17 @@ TABLES = {
                 transaction_time TIME,
                 payment_method VARCHAR,
                 shipping_address VARCHAR,
-                total_amount NUMERIC
+                total_amount NUMERIC,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+            ALTER TABLE public.transactions ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+            CREATE INDEX IF NOT EXISTS idx_transactions_loaded_at ON public.transactions (loaded_at);
+            CREATE INDEX IF NOT EXISTS idx_transactions_date ON public.transactions (transaction_date);
         """
     },
     "transaction_items": {
         "file": "transaction_items.csv",
+        "key": "item_id",
         "ddl": """
             CREATE TABLE IF NOT EXISTS public.transaction_items (
                 item_id VARCHAR PRIMARY KEY,
@@ -71,8 +128,12 @@ TABLES = {
                 unit_price NUMERIC,
                 discount_percentage NUMERIC,
                 line_total NUMERIC,
-                cost NUMERIC
+                cost NUMERIC,
+                loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
+            ALTER TABLE public.transaction_items ADD COLUMN IF NOT EXISTS loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+            CREATE INDEX IF NOT EXISTS idx_transaction_items_loaded_at ON public.transaction_items (loaded_at);
+            CREATE INDEX IF NOT EXISTS idx_transaction_items_transaction ON public.transaction_items (transaction_id);
         """
     }
 }
@@ -80,36 +141,738 @@ TABLES = {
 def get_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def load_table(cursor, table_name, config):
+def load_config():
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+# Wraps the raw file so the bytes handed to COPY can be measured; with a
+# limit it stops there, which is how a byte-range chunk is fed to COPY
+class CountingReader:
+    def __init__(self, f, limit=None):
+        self.f = f
+        self.limit = limit
+        self.bytes_read = 0
+
+    def clamp(self, size):
+        if self.limit is None:
+            return size
+        remaining = self.limit - self.bytes_read
+        return remaining if size is None or size < 0 else min(size, remaining)
+
+    def read(self, size=-1):
+        data = self.f.read(self.clamp(size))
+        self.bytes_read += len(data)
+        return data
+
+    def readline(self, size=-1):
+        line = self.f.readline(self.clamp(size))
+        self.bytes_read += len(line)
+        return line
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+def prepare_table(cursor, table_name, config):
+    cursor.execute(config["ddl"])
+    cursor.execute(f"TRUNCATE TABLE public.{table_name}")
+
+def read_header(reader):
+    return next(csv.reader([reader.readline().decode("utf-8")]))
+
+def column_types(cursor, table_name, columns):
+    cursor.execute("""
+        SELECT column_name, data_type
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = %s
+    """, (table_name,))
+    types = dict(cursor.fetchall())
+    return [types[c] for c in columns]
+
+def copy_csv(cursor, table_name, columns, buffer):
+    cursor.copy_expert(
+        f"COPY public.{table_name} ({','.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+        COPY_BUFFER_SIZE
+    )
+    return cursor.rowcount
+
+def copy_binary(cursor, table_name, columns, reader):
+    stream = BinaryCopyStream(reader, encoders_for(column_types(cursor, table_name, columns)))
+    cursor.copy_expert(
+        f"COPY public.{table_name} ({','.join(columns)}) FROM STDIN WITH (FORMAT binary)",
+        stream,
+        COPY_BUFFER_SIZE
+    )
+    return stream.rows
+
+def table_stats(rows, bytes_read, seconds, copy_format):
+    seconds = max(seconds, 1e-6)
+    return {
+        "rows_loaded": rows,
+        "status": "success",
+        "error_message": None,
+        "copy_format": copy_format,
+        "bytes_read": bytes_read,
+        "duration_seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1),
+        "bytes_per_second": round(bytes_read / seconds, 1)
+    }
+
+def copy_stream(cursor, table_name, columns, reader, copy_format="csv"):
+    if copy_format == "binary":
+        return copy_binary(cursor, table_name, columns, reader)
+    return copy_csv(cursor, table_name, columns, reader)
+
+def raw_file_path(config):
+    return find_raw_file(DATA_PATH, config["file"])
+
+def copy_file(cursor, table_name, file_path, copy_format="csv", target=None, byte_range=None):
+    # Stream the (decompressed) file straight into COPY; the header only supplies the column list
+    with open_raw(file_path, "rb") as f:
+        reader = CountingReader(f)
+        columns = read_header(reader)
+
+        if byte_range is not None:
+            f.seek(byte_range[0])
+            reader = CountingReader(f, limit=byte_range[1] - byte_range[0])
+
+        rows = copy_stream(cursor, target or table_name, columns, reader, copy_format)
+
+    return rows, reader.bytes_read
+
+def load_table(cursor, table_name, config, copy_format="csv"):
     print(f"Loading {table_name}...")
 
+    prepare_table(cursor, table_name, config)
+
+    start = time.time()
+    rows, bytes_read = copy_file(cursor, table_name, raw_file_path(config), copy_format)
+    return table_stats(rows, bytes_read, time.time() - start, copy_format)
+
+# ---------------- PARALLEL INGESTION ----------------
+# Byte offsets that split the data rows after the header into roughly equal
+# ranges, each ending on a line boundary (the raw files have no quoted newlines)
+def split_ranges(f, parts):
+    f.seek(0)
+    f.readline()
+    start = f.tell()
+    end = f.seek(0, os.SEEK_END)
+
+    bounds = [start]
+    for i in range(1, parts):
+        f.seek(max(start + (end - start) * i // parts - 1, bounds[-1]))
+        f.readline()
+        bounds.append(min(f.tell(), end))
+    bounds.append(end)
+
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def plan_ranges(file_path, split_bytes):
+    # Compressed streams cannot be entered mid-file, so they load as one range
+    size = os.path.getsize(file_path)
+    if size <= split_bytes or compression_of(file_path):
+        return None
+
+    with open(file_path, "rb") as f:
+        return split_ranges(f, -(-size // split_bytes))
+
+def load_table_whole(pool, table_name, config, copy_format):
+    # One connection, one transaction: the table is replaced entirely or not at all
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            return load_table(cur, table_name, config, copy_format)
+    finally:
+        pool.putconn(conn)
+
+def load_range(pool, table_name, config, copy_format, byte_range):
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            return copy_file(cur, table_name, raw_file_path(config), copy_format,
+                             target=f"{table_name}_load", byte_range=byte_range)
+    finally:
+        pool.putconn(conn)
+
+def create_load_table(cursor, table_name, config):
     cursor.execute(config["ddl"])
+    cursor.execute(f"DROP TABLE IF EXISTS public.{table_name}_load")
+    cursor.execute(f"CREATE UNLOGGED TABLE public.{table_name}_load (LIKE public.{table_name} INCLUDING DEFAULTS)")
+
+def publish_load_table(cursor, table_name):
     cursor.execute(f"TRUNCATE TABLE public.{table_name}")
+    cursor.execute(f"INSERT INTO public.{table_name} SELECT * FROM public.{table_name}_load")
+    cursor.execute(f"DROP TABLE public.{table_name}_load")
 
-    file_path = os.path.join(DATA_PATH, config["file"])
+def failed_stats(error):
+    return {"rows_loaded": 0, "status": "failed", "error_message": str(error)}
 
-    with open(file_path, "r", encoding="utf-8") as f:
-        reader = csv.reader(f)
-        headers = next(reader)
+# ---------------- SHADOW LOADS ----------------
+# Primary keys, unique constraints and plain indexes of the live table, so the
+# shadow can get the same ones after its data is in
+def table_indexes(cursor, table_name):
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid), c.conname, pg_get_constraintdef(c.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        LEFT JOIN pg_constraint c
+               ON c.conindid = x.indexrelid AND c.conrelid = x.indrelid AND c.contype IN ('p', 'u', 'x')
+        WHERE x.indrelid = %s::regclass
+    """, (f"public.{table_name}",))
+    return cursor.fetchall()
 
-        insert_sql = f"""
-            INSERT INTO public.{table_name} ({",".join(headers)})
-            VALUES ({",".join(["%s"] * len(headers))})
-        """
+def build_indexes(pool, table_name):
+    # One sorted build per index instead of maintaining it row by row during COPY
+    conn = pool.getconn()
+    try:
+        with conn, conn.cursor() as cur:
+            for index_name, index_def, constraint_name, constraint_def in table_indexes(cur, table_name):
+                if constraint_name:
+                    cur.execute(f"ALTER TABLE public.{table_name}_load "
+                                f"ADD CONSTRAINT {constraint_name}_load {constraint_def}")
+                else:
+                    cur.execute(index_def.replace(f"INDEX {index_name} ON public.{table_name} ",
+                                                  f"INDEX {index_name}_load ON public.{table_name}_load ", 1))
+            # Unlogged only while loading: the swapped-in table must survive a crash
+            cur.execute(f"ALTER TABLE public.{table_name}_load SET LOGGED")
+    finally:
+        pool.putconn(conn)
+
+def timed(fn, *args):
+    started = time.time()
+    return fn(*args), started, time.time()
+
+def swap_in_load_table(cursor, table_name):
+    indexes = table_indexes(cursor, table_name)
+
+    cursor.execute(f"ALTER TABLE public.{table_name} RENAME TO {table_name}_old")
+    cursor.execute(f"ALTER TABLE public.{table_name}_load RENAME TO {table_name}")
+    cursor.execute(f"DROP TABLE public.{table_name}_old")
+
+    # Index names are schema-wide, so the canonical ones are free only after the drop
+    for index_name, _, constraint_name, _ in indexes:
+        if constraint_name:
+            cursor.execute(f"ALTER TABLE public.{table_name} RENAME CONSTRAINT {constraint_name}_load TO {constraint_name}")
+        else:
+            cursor.execute(f"ALTER INDEX public.{index_name}_load RENAME TO {index_name}")
+
+# Loads every table into an unlogged, index-free shadow (chunked when large and
+# workers > 1), indexes the shadows and makes them logged, then swaps them all
+# in one short transaction
+def ingest_shadow(tables, copy_format, workers, split_bytes):
+    pool = ThreadedConnectionPool(1, workers, **DB_CONFIG)
+    plans = {table: (plan_ranges(raw_file_path(config), split_bytes) if workers > 1 else None) or [None]
+             for table, config in tables.items()}
+    tables_loaded = {}
+
+    try:
+        conn = pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                for table, config in tables.items():
+                    create_load_table(cur, table, config)
+        finally:
+            pool.putconn(conn)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            print(f"Loading {', '.join(tables)} into shadow tables...")
+            futures = {table: [executor.submit(timed, load_range, pool, table, tables[table], copy_format, r)
+                               for r in ranges]
+                       for table, ranges in plans.items()}
+
+            results, failures = {}, {}
+            for table, chunk_futures in futures.items():
+                try:
+                    results[table] = [f.result() for f in chunk_futures]
+                except Exception as e:
+                    failures[table] = e
+
+            if not failures:
+                index_futures = {table: executor.submit(build_indexes, pool, table) for table in tables}
+                for table, future in index_futures.items():
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failures[table] = e
+
+        conn = pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                if failures:
+                    for table in tables:
+                        cur.execute(f"DROP TABLE IF EXISTS public.{table}_load")
+                else:
+                    cur.execute("SET LOCAL lock_timeout = '10s'")
+                    for table in tables:
+                        swap_in_load_table(cur, table)
+        finally:
+            pool.putconn(conn)
+
+    finally:
+        pool.closeall()
+
+    # Nothing is swapped unless every shadow loaded and indexed
+    for table in tables:
+        if table in failures:
+            tables_loaded[f"staging.{table}"] = failed_stats(failures[table])
+        elif failures:
+            tables_loaded[f"staging.{table}"] = {"rows_loaded": 0, "status": "rolled_back", "error_message": None}
+        else:
+            # Tables share the workers, so each is timed from its first chunk
+            # starting to its last one finishing
+            chunks = results[table]
+            stats = table_stats(sum(r[0] for r, _, _ in chunks), sum(r[1] for r, _, _ in chunks),
+                                max(end for _, _, end in chunks) - min(begin for _, begin, _ in chunks), copy_format)
+            stats["chunks"] = len(chunks)
+            tables_loaded[f"staging.{table}"] = stats
+
+    return tables_loaded
+
+def ingest_parallel(tables, copy_format, workers, split_bytes):
+    # One connection per worker plus one for this thread's publishes: the pool
+    # raises rather than waits when exhausted
+    pool = ThreadedConnectionPool(1, workers + 1, **DB_CONFIG)
+    plans = {table: plan_ranges(raw_file_path(config), split_bytes)
+             for table, config in tables.items()}
+    tables_loaded = {}
+
+    try:
+        # Chunked tables land in an unlogged load table first; chunks commit on
+        # their own, and the real table only changes when every chunk succeeded
+        conn = pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                for table, ranges in plans.items():
+                    if ranges:
+                        create_load_table(cur, table, tables[table])
+        finally:
+            pool.putconn(conn)
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for table, ranges in plans.items():
+                if ranges:
+                    print(f"Loading {table} in {len(ranges)} chunks...")
+                    futures[table] = [executor.submit(load_range, pool, table, tables[table], copy_format, r)
+                                      for r in ranges]
+                else:
+                    futures[table] = executor.submit(load_table_whole, pool, table, tables[table], copy_format)
+
+            for table, future in futures.items():
+                if not plans[table]:
+                    try:
+                        tables_loaded[f"staging.{table}"] = future.result()
+                    except Exception as e:
+                        tables_loaded[f"staging.{table}"] = failed_stats(e)
+                    continue
+
+                # No chunk may still be writing the load table when it is
+                # published or dropped
+                wait(future)
+                conn = pool.getconn()
+                try:
+                    results = [f.result() for f in future]
+                    with conn, conn.cursor() as cur:
+                        publish_load_table(cur, table)
+                    stats = table_stats(sum(r[0] for r in results), sum(r[1] for r in results),
+                                        time.time() - start, copy_format)
+                    stats["chunks"] = len(results)
+                    tables_loaded[f"staging.{table}"] = stats
+                except Exception as e:
+                    with conn, conn.cursor() as cur:
+                        cur.execute(f"DROP TABLE IF EXISTS public.{table}_load")
+                    tables_loaded[f"staging.{table}"] = failed_stats(e)
+                finally:
+                    pool.putconn(conn)
+
+    finally:
+        pool.closeall()
+
+    return tables_loaded
+
+# ---------------- RESUMABLE INGESTION ----------------
+# Size, mtime and a hash of the first MiB: cheap, and enough to notice the
+# file was regenerated between a failed run and its retry
+def file_fingerprint(file_path):
+    stat = os.stat(file_path)
+    with open(file_path, "rb") as f:
+        head = hashlib.sha256(f.read(FINGERPRINT_BYTES)).hexdigest()
+    return f"{stat.st_size}-{stat.st_mtime_ns}-{head}"
+
+def skip_to(f, position, offset):
+    if f.seekable():
+        f.seek(offset)
+        return
+
+    # zstd streams only go forward, so skipping means reading past the bytes
+    while position < offset:
+        skipped = len(f.read(min(COPY_BUFFER_SIZE, offset - position)))
+        if not skipped:
+            raise ValueError(f"Checkpoint offset {offset} is past the end of the file")
+        position += skipped
 
-        for row in reader:
-            cursor.execute(insert_sql, row)
+def read_batches(f, offset, batch_rows, position=0):
+    skip_to(f, position, offset)
+    while True:
+        batch = b"".join(islice(f, batch_rows))
+        if not batch:
+            return
+        offset += len(batch)
+        yield batch, offset
 
-def main():
+def read_checkpoint(cursor, table_name, fingerprint):
+    cursor.execute(
+        "SELECT byte_offset, rows_loaded FROM public.ingestion_checkpoints "
+        "WHERE table_name = %s AND file_fingerprint = %s",
+        (table_name, fingerprint)
+    )
+    return cursor.fetchone()
+
+def save_checkpoint(cursor, table_name, fingerprint, offset, rows):
+    cursor.execute("""
+        INSERT INTO public.ingestion_checkpoints (table_name, file_fingerprint, byte_offset, rows_loaded)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (table_name) DO UPDATE
+        SET file_fingerprint = EXCLUDED.file_fingerprint,
+            byte_offset = EXCLUDED.byte_offset,
+            rows_loaded = EXCLUDED.rows_loaded,
+            updated_at = CURRENT_TIMESTAMP
+    """, (table_name, fingerprint, offset, rows))
+
+def load_table_resumable(conn, table_name, config, copy_format, batch_rows):
+    file_path = raw_file_path(config)
+    fingerprint = file_fingerprint(file_path)
+    start = time.time()
+
+    # Skipping to the checkpoint in a compressed stream decompresses up to it, but loads nothing twice
+    with open_raw(file_path, "rb") as f:
+        reader = CountingReader(f)
+        columns = read_header(reader)
+
+        with conn.cursor() as cur:
+            cur.execute(CHECKPOINT_DDL)
+            cur.execute(config["ddl"])
+            checkpoint = read_checkpoint(cur, table_name, fingerprint)
+
+            if checkpoint:
+                offset, rows = checkpoint
+                print(f"Resuming {table_name} at row {rows:,}...")
+            else:
+                # No usable checkpoint (first run, or the file changed): start over
+                print(f"Loading {table_name}...")
+                offset, rows = reader.bytes_read, 0
+                cur.execute(f"TRUNCATE TABLE public.{table_name}")
+                save_checkpoint(cur, table_name, fingerprint, offset, rows)
+            conn.commit()
+
+            resumed_from, bytes_read = rows, 0
+
+            # Each batch and the checkpoint that covers it commit together,
+            # so a rerun never loads a row twice or skips one
+            for batch, offset in read_batches(f, offset, batch_rows, reader.bytes_read):
+                rows += copy_stream(cur, table_name, columns, io.BytesIO(batch), copy_format)
+                save_checkpoint(cur, table_name, fingerprint, offset, rows)
+                conn.commit()
+                bytes_read += len(batch)
+
+            cur.execute("DELETE FROM public.ingestion_checkpoints WHERE table_name = %s", (table_name,))
+            conn.commit()
+
+    stats = table_stats(rows, bytes_read, time.time() - start, copy_format)
+    stats["resumed_from_row"] = resumed_from
+    return stats
+
+def ingest_resumable(tables, copy_format, batch_rows):
+    conn = get_connection()
+    tables_loaded = {}
+
+    try:
+        for table, config in tables.items():
+            try:
+                tables_loaded[f"staging.{table}"] = load_table_resumable(conn, table, config, copy_format, batch_rows)
+            except Exception as e:
+                # Committed batches stay; the next run picks up from the checkpoint
+                conn.rollback()
+                tables_loaded[f"staging.{table}"] = failed_stats(e)
+                break
+
+    finally:
+        conn.close()
+
+    # Tables after a failure are not tried this run, but still get a summary entry
+    for table in tables:
+        tables_loaded.setdefault(f"staging.{table}", {"rows_loaded": 0, "status": "not_attempted",
+                                                      "error_message": None})
+
+    return tables_loaded
+
+# ---------------- UPSERT (RE-DELIVERED FILES) ----------------
+# Merges one COPYed batch into the live table. Rows are hashed as they arrive;
+# a conflicting row is rewritten only when its stored hash differs, so resent
+# unchanged records cost no new row versions. Rows loaded by the other modes
+# have no hash yet and are rewritten once. Within a batch the last copy of a
+# key wins
+def merge_batch(cursor, table_name, key, columns):
+    cols = ", ".join(columns)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns if c != key)
+
+    cursor.execute(f"""
+        WITH batch AS (
+            SELECT DISTINCT ON ({key}) {cols}, md5(ROW({cols})::text) AS row_hash
+            FROM public.{table_name}_upsert
+            ORDER BY {key}, batch_row DESC
+        ),
+        merged AS (
+            INSERT INTO public.{table_name} AS t ({cols}, row_hash)
+            SELECT {cols}, row_hash FROM batch
+            ON CONFLICT ({key}) DO UPDATE
+            SET {updates}, row_hash = EXCLUDED.row_hash, loaded_at = DEFAULT
+            WHERE t.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT
+            (SELECT COUNT(*) FROM public.{table_name}_upsert),
+            (SELECT COUNT(*) FROM batch),
+            COUNT(*) FILTER (WHERE inserted),
+            COUNT(*) FILTER (WHERE NOT inserted)
+        FROM merged
+    """)
+    batch_rows, distinct_rows, inserted, updated = cursor.fetchone()
+    cursor.execute(f"TRUNCATE TABLE public.{table_name}_upsert")
+
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": distinct_rows - inserted - updated,
+        "duplicates_in_file": batch_rows - distinct_rows
+    }
+
+def load_table_upsert(conn, table_name, config, copy_format, batch_rows):
+    print(f"Upserting {table_name}...")
+    start = time.time()
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates_in_file": 0}
+    rows, bytes_read = 0, 0
+
+    with open_raw(raw_file_path(config), "rb") as f, conn.cursor() as cur:
+        reader = CountingReader(f)
+        columns = read_header(reader)
+
+        cur.execute(config["ddl"])
+        cur.execute(f"ALTER TABLE public.{table_name} ADD COLUMN IF NOT EXISTS row_hash CHAR(32)")
+        cur.execute(f"DROP TABLE IF EXISTS public.{table_name}_upsert")
+        cur.execute(f"CREATE UNLOGGED TABLE public.{table_name}_upsert "
+                    f"(LIKE public.{table_name} INCLUDING DEFAULTS, batch_row BIGSERIAL)")
+
+        for batch, _ in read_batches(f, reader.bytes_read, batch_rows, reader.bytes_read):
+            rows += copy_stream(cur, f"{table_name}_upsert", columns, io.BytesIO(batch), copy_format)
+            for name, count in merge_batch(cur, table_name, config["key"], columns).items():
+                counts[name] += count
+            bytes_read += len(batch)
+
+        cur.execute(f"DROP TABLE public.{table_name}_upsert")
+        staging_rows = staging_row_count(cur, table_name)
+
+    conn.commit()
+
+    stats = table_stats(rows, bytes_read, time.time() - start, copy_format)
+    stats.update(counts, staging_rows=staging_rows)
+    return stats
+
+def ingest_upsert(tables, copy_format, batch_rows):
+    conn = get_connection()
+    tables_loaded = {}
+
+    try:
+        # Upserts are idempotent, so each table commits on its own
+        for table, config in tables.items():
+            try:
+                tables_loaded[f"staging.{table}"] = load_table_upsert(conn, table, config, copy_format, batch_rows)
+            except Exception as e:
+                conn.rollback()
+                tables_loaded[f"staging.{table}"] = failed_stats(e)
+
+    finally:
+        conn.close()
+
+    return tables_loaded
+
+def ingest_serial(tables, copy_format):
     conn = get_connection()
     cur = conn.cursor()
+    tables_loaded = {}
+
+    try:
+        for table, config in tables.items():
+            tables_loaded[f"staging.{table}"] = load_table(cur, table, config, copy_format)
+        conn.commit()
+
+    except Exception as e:
+        # Everything runs in one transaction, so earlier tables are rolled back too
+        conn.rollback()
+        for stats in tables_loaded.values():
+            stats["status"] = "rolled_back"
+        failed = next(t for t in tables if f"staging.{t}" not in tables_loaded)
+        tables_loaded[f"staging.{failed}"] = failed_stats(e)
+
+    finally:
+        cur.close()
+        conn.close()
+
+    return tables_loaded
+
+# ---------------- MANIFEST ----------------
+def content_hash(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def file_entry(file_path):
+    stat = os.stat(file_path)
+    return {"file": os.path.basename(file_path), "size": stat.st_size, "mtime": stat.st_mtime, "sha256": content_hash(file_path)}
+
+def read_manifest():
+    if not os.path.exists(MANIFEST_PATH):
+        return {}
+    with open(MANIFEST_PATH, "r") as f:
+        return json.load(f)
+
+def write_manifest(manifest):
+    os.makedirs(os.path.dirname(MANIFEST_PATH), exist_ok=True)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump(manifest, f, indent=4)
+
+def staging_row_count(cursor, table_name):
+    cursor.execute("SELECT to_regclass(%s)", (f"public.{table_name}",))
+    if cursor.fetchone()[0] is None:
+        return None
+    cursor.execute(f"SELECT COUNT(*) FROM public.{table_name}")
+    return cursor.fetchone()[0]
+
+# A table is skipped only when its file hashes the same as last time and the
+# staging table still holds the rows that load produced
+def plan_tables(cursor, manifest, force=False):
+    entries, to_load, skipped = {}, {}, {}
 
     for table, config in TABLES.items():
-        load_table(cur, table, config)
+        entry = file_entry(raw_file_path(config))
+        previous = manifest.get(table)
+        entries[table] = entry
+
+        unchanged = (
+            not force
+            and previous is not None
+            and previous.get("file") == entry["file"]
+            and previous["size"] == entry["size"]
+            and previous["sha256"] == entry["sha256"]
+            and staging_row_count(cursor, table) == previous["rows_loaded"]
+        )
+
+        if unchanged:
+            print(f"Skipping {table} (unchanged)")
+            skipped[f"staging.{table}"] = {
+                "rows_loaded": 0,
+                "staging_rows": previous["rows_loaded"],
+                "status": "skipped",
+                "error_message": None
+            }
+        else:
+            to_load[table] = config
+
+    return to_load, skipped, entries
+
+def update_manifest(manifest, entries, tables_loaded):
+    for name, stats in tables_loaded.items():
+        table = name.split(".", 1)[1]
+        if stats["status"] == "success":
+            stats["action"] = "reloaded" if table in manifest else "loaded"
+            manifest[table] = {**entries[table], "rows_loaded": stats.get("staging_rows", stats["rows_loaded"])}
+        elif stats["status"] != "skipped":
+            # Staging no longer matches the recorded load, so never skip it next time
+            manifest.pop(table, None)
+    return manifest
+
+def write_summary(tables_loaded, total_seconds):
+    summary = {
+        "ingestion_timestamp": datetime.utcnow().isoformat(),
+        "tables_loaded": tables_loaded,
+        "skipped": [t for t, stats in tables_loaded.items() if stats["status"] == "skipped"],
+        "loaded": [t for t, stats in tables_loaded.items() if stats.get("action") == "loaded"],
+        "reloaded": [t for t, stats in tables_loaded.items() if stats.get("action") == "reloaded"],
+        "total_execution_time_seconds": round(total_seconds, 2)
+    }
+
+    os.makedirs(os.path.dirname(SUMMARY_PATH), exist_ok=True)
+    with open(SUMMARY_PATH, "w") as f:
+        json.dump(summary, f, indent=4)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load raw CSVs into the staging tables")
+    parser.add_argument("--format", choices=COPY_FORMATS, default=None,
+                        help="COPY wire format (default: ingestion.copy_format, else csv)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel loaders on pooled connections (default: ingestion.workers, else 1)")
+    parser.add_argument("--load-mode", choices=LOAD_MODES, default=None,
+                        help="direct: truncate and COPY in place; shadow: load an unlogged copy and swap it in; "
+                             "upsert: merge batches on the natural key (default: ingestion.load_mode, else direct)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Commit every pipeline.batch_size rows and continue from the last checkpoint")
+    parser.add_argument("--force", action="store_true",
+                        help="Reload every table even if its raw file is unchanged")
+    parser.add_argument("--validate", action="store_true",
+                        help="Run the pre-ingest validator first and load only its clean rows")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    global DATA_PATH
+
+    args = parse_args(argv)
+    config = load_config()
+    settings = config.get("ingestion") or {}
+    copy_format = args.format or settings.get("copy_format", "csv")
+    workers = args.workers or int(settings.get("workers", 1))
+    load_mode = args.load_mode or settings.get("load_mode", "direct")
+    split_bytes = int(settings.get("split_mb", DEFAULT_SPLIT_MB)) * 1024 * 1024
+
+    start = time.time()
+
+    # Bad rows go to data/quarantine; the loader reads the clean copies instead of data/raw
+    if args.validate or settings.get("validate", False):
+        validate_raw_files(raw_dir=DATA_PATH)
+        DATA_PATH = CLEAN_DIR
+
+    manifest = read_manifest()
+
+    conn = get_connection()
+    try:
+        with conn.cursor() as cur:
+            tables, tables_loaded, entries = plan_tables(cur, manifest, force=args.force)
+    finally:
+        conn.close()
+
+    if not tables:
+        print("All staging tables are up to date")
+    elif args.resume or settings.get("resumable", False):
+        tables_loaded.update(ingest_resumable(tables, copy_format, int(config["pipeline"]["batch_size"])))
+    elif load_mode == "upsert":
+        batch_rows = int(settings.get("upsert_batch_rows", DEFAULT_UPSERT_BATCH_ROWS))
+        tables_loaded.update(ingest_upsert(tables, copy_format, batch_rows))
+    elif load_mode == "shadow":
+        tables_loaded.update(ingest_shadow(tables, copy_format, workers, split_bytes))
+    elif workers > 1:
+        tables_loaded.update(ingest_parallel(tables, copy_format, workers, split_bytes))
+    else:
+        tables_loaded.update(ingest_serial(tables, copy_format))
+
+    write_manifest(update_manifest(manifest, entries, tables_loaded))
+    write_summary(tables_loaded, time.time() - start)
+
+    failed = [t for t, stats in tables_loaded.items() if stats["status"] == "failed"]
+    if failed:
+        raise RuntimeError(f"Ingestion failed for: {', '.join(failed)}")
 
-    conn.commit()
-    cur.close()
-    conn.close()
     print("✅ Ingestion completed successfully")
 
 if __name__ == "__main__":
@@ -103,7 +103,8 @@ def main():
             SELECT d.full_date, COUNT(f.sales_key)
             FROM warehouse.fact_sales f
             JOIN warehouse.dim_date d ON f.date_key = d.date_key
-            WHERE d.full_date >= CURRENT_DATE - INTERVAL '30 days'
+            WHERE f.date_key >= to_char(CURRENT_DATE - 30, 'YYYYMMDD')::INTEGER
+              AND d.full_date >= CURRENT_DATE - INTERVAL '30 days'
             GROUP BY d.full_date
             ORDER BY d.full_date
             """
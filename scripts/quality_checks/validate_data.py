@@ -241,6 +241,16 @@ def calculate_weighted_score(results):
     return max(0, round(score, 2))
 
 
+def quality_grade(score):
+    return (
+        "A" if score >= 90 else
+        "B" if score >= 80 else
+        "C" if score >= 70 else
+        "D" if score >= 60 else
+        "F"
+    )
+
+
 # ---------------- MAIN ----------------
 def validate():
     conn = get_connection()
@@ -263,14 +273,7 @@ def validate():
     }
 
     overall_score = calculate_weighted_score(results)
-
-    grade = (
-        "A" if overall_score >= 90 else
-        "B" if overall_score >= 80 else
-        "C" if overall_score >= 70 else
-        "D" if overall_score >= 60 else
-        "F"
-    )
+    grade = quality_grade(overall_score)
 
     report = {
         "check_timestamp": datetime.utcnow().isoformat(),
@@ -0,0 +1,186 @@
+# =========================
+# AGGREGATE MAINTENANCE
+# =========================
+# Whatever takes rows out of fact_sales or puts them in (a fact load
+# replacing whole transaction dates, a retention drop of whole months)
+# keeps those rows in the fact_removed / fact_added temp tables. The
+# aggregates are merged from them in the same transaction, so they never
+# disagree with fact_sales and only touched keys are written:
+#   - agg_daily_sales: a date's rows always leave or arrive together, so
+#     each touched date is recomputed from its new rows, distinct counts
+#     included, or deleted when it has none
+#   - agg_product_performance: additive sums; the discount average is kept
+#     as a discount_sum / discount_count pair and re-derived on merge
+#   - agg_customer_metrics: a transaction never spans two dates, so its
+#     distinct count is additive too; avg_order_value is total_spent /
+#     order_lines, and last_purchase_date (a MAX) is recomputed per customer
+# Keys left with no fact rows are deleted. A full rebuild runs the same
+# statements with all of fact_sales as the added rows.
+
+AGGREGATE_DDL = """
+    ALTER TABLE warehouse.agg_product_performance
+        ADD COLUMN IF NOT EXISTS discount_sum DECIMAL(12,2),
+        ADD COLUMN IF NOT EXISTS discount_count BIGINT,
+        ADD COLUMN IF NOT EXISTS sales_rows BIGINT;
+    ALTER TABLE warehouse.agg_customer_metrics
+        ADD COLUMN IF NOT EXISTS order_lines BIGINT;
+"""
+
+# Rows built before the sum/count pairs existed, or by the old rebuild that
+# could leave a sum NULL, can't be merged into
+NEEDS_REBUILD_SQL = """
+    SELECT
+        EXISTS (SELECT 1 FROM warehouse.agg_product_performance
+                WHERE discount_count IS NULL OR sales_rows IS NULL
+                   OR total_quantity_sold IS NULL OR total_revenue IS NULL OR total_profit IS NULL)
+        OR EXISTS (SELECT 1 FROM warehouse.agg_customer_metrics
+                   WHERE order_lines IS NULL OR total_spent IS NULL)
+"""
+
+FACT_DELTA_COLUMNS = """
+    date_key INTEGER,
+    customer_key INTEGER,
+    product_key INTEGER,
+    transaction_id VARCHAR(20),
+    quantity INTEGER,
+    discount_amount DECIMAL(10,2),
+    line_total DECIMAL(10,2),
+    profit DECIMAL(10,2)
+"""
+FACT_DELTA_FIELDS = ("date_key", "customer_key", "product_key", "transaction_id",
+                     "quantity", "discount_amount", "line_total", "profit")
+FACT_DELTA_RETURNING = f"RETURNING {', '.join(FACT_DELTA_FIELDS)}"
+
+# The removed side of a full rebuild
+NO_FACT_ROWS = "(SELECT * FROM warehouse.fact_sales WHERE FALSE)"
+
+def create_delta_tables(cur):
+    cur.execute(f"CREATE TEMP TABLE fact_removed ({FACT_DELTA_COLUMNS}) ON COMMIT DROP")
+    cur.execute(f"CREATE TEMP TABLE fact_added ({FACT_DELTA_COLUMNS}) ON COMMIT DROP")
+
+def merge_daily_sales(cur, added="fact_added", removed="fact_removed"):
+    cur.execute(f"""
+        INSERT INTO warehouse.agg_daily_sales AS a
+        (date_key, total_transactions, total_revenue, total_profit, unique_customers)
+        SELECT date_key,
+               COUNT(DISTINCT transaction_id),
+               SUM(line_total),
+               SUM(profit),
+               COUNT(DISTINCT customer_key)
+        FROM {added} AS added_rows
+        GROUP BY date_key
+        ON CONFLICT (date_key) DO UPDATE SET
+            total_transactions = EXCLUDED.total_transactions,
+            total_revenue = EXCLUDED.total_revenue,
+            total_profit = EXCLUDED.total_profit,
+            unique_customers = EXCLUDED.unique_customers
+    """)
+    cur.execute(f"""
+        DELETE FROM warehouse.agg_daily_sales
+        WHERE date_key IN (SELECT date_key FROM {removed} AS removed_rows)
+          AND date_key NOT IN (SELECT date_key FROM {added} AS added_rows)
+    """)
+
+def merge_product_performance(cur, added="fact_added", removed="fact_removed"):
+    cur.execute(f"""
+        WITH changes AS (
+            SELECT product_key, quantity, line_total, profit, discount_amount, 1 AS sign
+            FROM {added} AS added_rows
+            UNION ALL
+            SELECT product_key, -quantity, -line_total, -profit, -discount_amount, -1
+            FROM {removed} AS removed_rows
+        )
+        INSERT INTO warehouse.agg_product_performance AS a
+        (product_key, total_quantity_sold, total_revenue, total_profit, avg_discount_percentage,
+         discount_sum, discount_count, sales_rows)
+        SELECT product_key,
+               COALESCE(SUM(quantity), 0),
+               COALESCE(SUM(line_total), 0),
+               COALESCE(SUM(profit), 0),
+               SUM(discount_amount) / NULLIF(SUM(sign) FILTER (WHERE discount_amount IS NOT NULL), 0),
+               COALESCE(SUM(discount_amount), 0),
+               COALESCE(SUM(sign) FILTER (WHERE discount_amount IS NOT NULL), 0),
+               SUM(sign)
+        FROM changes
+        GROUP BY product_key
+        ON CONFLICT (product_key) DO UPDATE SET
+            total_quantity_sold = a.total_quantity_sold + EXCLUDED.total_quantity_sold,
+            total_revenue = a.total_revenue + EXCLUDED.total_revenue,
+            total_profit = a.total_profit + EXCLUDED.total_profit,
+            discount_sum = a.discount_sum + EXCLUDED.discount_sum,
+            discount_count = a.discount_count + EXCLUDED.discount_count,
+            avg_discount_percentage = (a.discount_sum + EXCLUDED.discount_sum)
+                                      / NULLIF(a.discount_count + EXCLUDED.discount_count, 0),
+            sales_rows = a.sales_rows + EXCLUDED.sales_rows
+    """)
+    cur.execute("DELETE FROM warehouse.agg_product_performance WHERE sales_rows <= 0")
+
+def merge_customer_metrics(cur, added="fact_added", removed="fact_removed"):
+    cur.execute(f"""
+        WITH added AS (
+            SELECT customer_key, COUNT(DISTINCT transaction_id) AS transactions,
+                   SUM(line_total) AS spent, COUNT(*) AS lines
+            FROM {added} AS added_rows
+            GROUP BY customer_key
+        ),
+        removed AS (
+            SELECT customer_key, COUNT(DISTINCT transaction_id) AS transactions,
+                   SUM(line_total) AS spent, COUNT(*) AS lines
+            FROM {removed} AS removed_rows
+            GROUP BY customer_key
+        )
+        INSERT INTO warehouse.agg_customer_metrics AS a
+        (customer_key, total_transactions, total_spent, avg_order_value, order_lines)
+        SELECT customer_key,
+               COALESCE(ad.transactions, 0) - COALESCE(r.transactions, 0),
+               COALESCE(ad.spent, 0) - COALESCE(r.spent, 0),
+               ad.spent / NULLIF(ad.lines, 0),
+               COALESCE(ad.lines, 0) - COALESCE(r.lines, 0)
+        FROM added ad
+        FULL JOIN removed r USING (customer_key)
+        ON CONFLICT (customer_key) DO UPDATE SET
+            total_transactions = a.total_transactions + EXCLUDED.total_transactions,
+            total_spent = a.total_spent + EXCLUDED.total_spent,
+            order_lines = a.order_lines + EXCLUDED.order_lines,
+            avg_order_value = (a.total_spent + EXCLUDED.total_spent)
+                              / NULLIF(a.order_lines + EXCLUDED.order_lines, 0)
+    """)
+    cur.execute("DELETE FROM warehouse.agg_customer_metrics WHERE order_lines <= 0")
+
+    # A MAX can't be un-merged when rows leave, so look it up again
+    cur.execute(f"""
+        UPDATE warehouse.agg_customer_metrics a
+        SET last_purchase_date = (
+            SELECT MAX(f.created_at::DATE) FROM warehouse.fact_sales f
+            WHERE f.customer_key = a.customer_key
+        )
+        WHERE a.customer_key IN (
+            SELECT customer_key FROM {added} AS added_rows
+            UNION
+            SELECT customer_key FROM {removed} AS removed_rows
+        )
+    """)
+
+def merge_aggregates(cur, added="fact_added", removed="fact_removed"):
+    merge_daily_sales(cur, added, removed)
+    merge_product_performance(cur, added, removed)
+    merge_customer_metrics(cur, added, removed)
+
+def merge_aggregate_deltas(cur):
+    cur.execute(AGGREGATE_DDL)
+    cur.execute(NEEDS_REBUILD_SQL)
+    if cur.fetchone()[0]:
+        rebuild_aggregates(cur)
+        return "rebuilt"
+
+    merge_aggregates(cur)
+    return "merged"
+
+# Full recompute from fact_sales, for first use or after a manual repair.
+# DELETE rather than TRUNCATE, so readers keep the old rows until commit
+def rebuild_aggregates(cur):
+    cur.execute(AGGREGATE_DDL)
+    cur.execute("DELETE FROM warehouse.agg_daily_sales")
+    cur.execute("DELETE FROM warehouse.agg_product_performance")
+    cur.execute("DELETE FROM warehouse.agg_customer_metrics")
+    merge_aggregates(cur, added="warehouse.fact_sales", removed=NO_FACT_ROWS)
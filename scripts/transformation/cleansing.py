@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from decimal import ROUND_HALF_UP, Decimal
+
+PRICE_BREAKS = [50, 200]
+PRICE_CATEGORIES = np.array(["Budget", "Mid-range", "Premium"], dtype=object)
+CENT = Decimal("0.01")
+
+
+# -------------------------------
+# Batch Cleansing
+# -------------------------------
+# Cities, states, countries and names repeat heavily, so each string function
+# runs once per distinct value and the results are mapped back. Empty and
+# missing values come back as None, as the scalar versions always did.
+def map_distinct(values, transform):
+    values = pd.Series(values, dtype=object)
+    present = values.notna() & values.astype(bool)
+
+    distinct = pd.Series(values[present].unique(), dtype=object)
+    lookup = pd.Series(transform(distinct).to_numpy(), index=distinct.to_numpy(), dtype=object)
+
+    result = values.map(lookup).astype(object)
+    return result.where(present, None)
+
+
+def normalize_text_batch(values):
+    return map_distinct(values, lambda v: v.str.strip())
+
+
+def normalize_email_batch(values):
+    return map_distinct(values, lambda v: v.str.lower().str.strip())
+
+
+def normalize_phone_batch(values):
+    return map_distinct(values, lambda v: v.map(lambda phone: "".join(filter(str.isdigit, phone))))
+
+
+def title_case_batch(values):
+    return map_distinct(values, lambda v: v.str.title())
+
+
+# -------------------------------
+# Batch Enrichment
+# -------------------------------
+# Decimal arithmetic rounded half away from zero, as PostgreSQL's
+# round(numeric, 2) does in the SQL push-down: binary floats land on the
+# wrong side of ties such as 64.00 / 44.88 -> 29.875
+def profit_margin(price, cost):
+    if price is None or cost is None or pd.isna(price) or pd.isna(cost):
+        return None
+    price, cost = Decimal(str(price)), Decimal(str(cost))
+    if price <= 0:
+        return None
+    return ((price - cost) / price * 100).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def round_cents(value):
+    if value is None or pd.isna(value):
+        return None
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def calculate_profit_margin_batch(price, cost):
+    return np.array([profit_margin(p, c) for p, c in zip(price, cost)], dtype=object)
+
+
+def price_category_batch(price):
+    price = np.asarray(price, dtype=float)
+    categories = PRICE_CATEGORIES[np.digitize(price, PRICE_BREAKS)]
+    return np.where(np.isnan(price), None, categories)
+
+
+# -------------------------------
+# Scalar Wrappers
+# -------------------------------
+def normalize_text(val):
+    return normalize_text_batch([val])[0]
+
+
+def normalize_email(email):
+    return normalize_email_batch([email])[0]
+
+
+def normalize_phone(phone):
+    return normalize_phone_batch([phone])[0]
+
+
+def title_case(val):
+    return title_case_batch([val])[0]
+
+
+def calculate_profit_margin(price, cost):
+    return calculate_profit_margin_batch([price], [cost])[0]
+
+
+def price_category(price):
+    return price_category_batch([price])[0]
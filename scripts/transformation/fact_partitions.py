@@ -0,0 +1,280 @@
+import argparse
+import re
+import sys
+import psycopg2
+import yaml
+from datetime import date, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.transformation.aggregates import FACT_DELTA_FIELDS, create_delta_tables, merge_aggregate_deltas
+
+CONFIG_PATH = BASE_DIR / "config" / "config.yaml"
+
+DB_CONFIG = {
+    "host": "localhost",
+    "port": "5432",
+    "dbname": "ecommerce",
+    "user": "postgres",
+    "password": "postgres"
+}
+
+DEFAULT_MONTHS_AHEAD = 3
+PARTITION_NAME = re.compile(r"^fact_sales_(\d{4})_(\d{2})$")
+
+# fact_sales is range-partitioned by month on date_key (YYYYMMDD). Queries
+# bounded on date_key only touch their months, and retention drops whole
+# partitions instead of deleting rows. The primary key has to include the
+# partition key; indexes declared here are created on every partition.
+FACT_SALES_DDL = """
+    CREATE TABLE warehouse.fact_sales (
+        sales_key BIGSERIAL,
+        date_key INTEGER NOT NULL,
+        customer_key INTEGER NOT NULL,
+        product_key INTEGER NOT NULL,
+        payment_method_key INTEGER NOT NULL,
+        transaction_id VARCHAR(20),
+        quantity INTEGER,
+        unit_price DECIMAL(10,2),
+        discount_amount DECIMAL(10,2),
+        line_total DECIMAL(10,2),
+        profit DECIMAL(10,2),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+
+        PRIMARY KEY (sales_key, date_key),
+        FOREIGN KEY (date_key) REFERENCES warehouse.dim_date(date_key),
+        FOREIGN KEY (customer_key) REFERENCES warehouse.dim_customers(customer_key),
+        FOREIGN KEY (product_key) REFERENCES warehouse.dim_products(product_key),
+        FOREIGN KEY (payment_method_key) REFERENCES warehouse.dim_payment_method(payment_method_key)
+    ) PARTITION BY RANGE (date_key);
+
+    CREATE INDEX idx_fact_date ON warehouse.fact_sales(date_key);
+    CREATE INDEX idx_fact_customer ON warehouse.fact_sales(customer_key);
+    CREATE INDEX idx_fact_product ON warehouse.fact_sales(product_key);
+    CREATE INDEX idx_fact_payment ON warehouse.fact_sales(payment_method_key);
+"""
+
+def get_connection():
+    return psycopg2.connect(**DB_CONFIG)
+
+def load_config():
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+# =========================
+# MONTHS AND BOUNDS
+# =========================
+def month_start(day):
+    return day.replace(day=1)
+
+def next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def months_between(first, last):
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+def date_key(day):
+    return int(day.strftime("%Y%m%d"))
+
+def from_date_key(key):
+    return date(key // 10000, key // 100 % 100, key % 100)
+
+def partition_name(month):
+    return f"fact_sales_{month:%Y_%m}"
+
+def bounds(month):
+    return date_key(month), date_key(next_month(month))
+
+# =========================
+# CATALOG
+# =========================
+def is_partitioned(cur):
+    cur.execute("""
+        SELECT EXISTS (
+            SELECT 1 FROM pg_partitioned_table
+            WHERE partrelid = 'warehouse.fact_sales'::regclass
+        )
+    """)
+    return cur.fetchone()[0]
+
+# month -> partition, read from the partition names this module gives them
+def existing_partitions(cur):
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'warehouse.fact_sales'::regclass
+    """)
+    partitions = {}
+    for (name,) in cur.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return partitions
+
+# =========================
+# PARTITION MANAGEMENT
+# =========================
+def create_partition(cur, month):
+    low, high = bounds(month)
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS warehouse.{partition_name(month)}
+        PARTITION OF warehouse.fact_sales
+        FOR VALUES FROM ({low}) TO ({high})
+    """)
+
+# Creates the missing monthly partitions from first through last, plus
+# months_ahead months past last so the next loads already have a home
+def ensure_partitions(cur, first, last, months_ahead=0):
+    existing = existing_partitions(cur)
+    created = []
+    for month in months_between(first, add_months(month_start(last), months_ahead)):
+        if month not in existing:
+            create_partition(cur, month)
+            created.append(partition_name(month))
+    return created
+
+# A table loaded on its own becomes a partition without a validation scan:
+# the CHECK constraint already proves its rows fit the bounds
+def attach_partition(cur, table, month):
+    low, high = bounds(month)
+    cur.execute(f"""
+        ALTER TABLE warehouse.{table}
+        ADD CONSTRAINT {table}_bounds CHECK (date_key >= {low} AND date_key < {high})
+    """)
+    cur.execute(f"""
+        ALTER TABLE warehouse.fact_sales
+        ATTACH PARTITION warehouse.{table} FOR VALUES FROM ({low}) TO ({high})
+    """)
+    cur.execute(f"ALTER TABLE warehouse.{table} DROP CONSTRAINT {table}_bounds")
+
+# Retention: whole months before `keep_from` go at once. The aggregates are
+# kept by deltas, so the dropped rows are merged out of them first, the
+# same way a fact reload removes rows
+def drop_partitions_before(cur, keep_from):
+    dropped = [name for month, name in sorted(existing_partitions(cur).items())
+               if next_month(month) <= month_start(keep_from)]
+    if not dropped:
+        return []
+
+    create_delta_tables(cur)
+    for name in dropped:
+        cur.execute(f"""
+            INSERT INTO fact_removed
+            SELECT {", ".join(FACT_DELTA_FIELDS)} FROM warehouse.{name}
+        """)
+        cur.execute(f"DROP TABLE warehouse.{name}")
+
+    merge_aggregate_deltas(cur)
+    return dropped
+
+def retention_start(months, today=None):
+    if not months:
+        return None
+    return add_months(month_start(today or date.today()), -int(months))
+
+# The one retention horizon: the fact loader skips dates before it and
+# manage_partitions drops months before it. Were they to differ, a load
+# would refill dropped months and merge them into the aggregates again.
+def configured_retention_start(settings, today=None):
+    return retention_start(settings.get("fact_retention_months"), today)
+
+# =========================
+# MIGRATION
+# =========================
+# Turns an existing plain fact_sales into the partitioned table. Each month
+# is copied into a standalone table and attached, the sales_key sequence
+# continues past the copied keys, and the old heap is dropped.
+def migrate_to_partitioned(cur):
+    if is_partitioned(cur):
+        return []
+
+    cur.execute("ALTER TABLE warehouse.fact_sales RENAME TO fact_sales_unpartitioned")
+    cur.execute("ALTER INDEX warehouse.fact_sales_pkey RENAME TO fact_sales_unpartitioned_pkey")
+    cur.execute("ALTER INDEX warehouse.idx_fact_date RENAME TO idx_fact_unpartitioned_date")
+    for index in ("idx_fact_customer", "idx_fact_product", "idx_fact_payment"):
+        cur.execute(f"DROP INDEX IF EXISTS warehouse.{index}")
+    cur.execute(FACT_SALES_DDL)
+
+    cur.execute("SELECT MIN(date_key), MAX(date_key), MAX(sales_key) FROM warehouse.fact_sales_unpartitioned")
+    first, last, max_key = cur.fetchone()
+
+    attached = []
+    if first is not None:
+        for month in months_between(from_date_key(first), from_date_key(last)):
+            low, high = bounds(month)
+            table = partition_name(month)
+            cur.execute(f"CREATE TABLE warehouse.{table} (LIKE warehouse.fact_sales INCLUDING DEFAULTS)")
+            cur.execute(f"""
+                INSERT INTO warehouse.{table}
+                SELECT * FROM warehouse.fact_sales_unpartitioned
+                WHERE date_key >= {low} AND date_key < {high}
+            """)
+            attach_partition(cur, table, month)
+            attached.append(table)
+
+        cur.execute("SELECT setval(pg_get_serial_sequence('warehouse.fact_sales', 'sales_key'), %s)", (max_key,))
+
+    cur.execute("DROP TABLE warehouse.fact_sales_unpartitioned")
+    return attached
+
+# Called by the fact loader before it writes dates first..last
+def prepare_partitions(cur, first, last, months_ahead=DEFAULT_MONTHS_AHEAD):
+    migrate_to_partitioned(cur)
+    return ensure_partitions(cur, first, last, months_ahead)
+
+# =========================
+# MAIN
+# =========================
+def manage_partitions(months_ahead=None):
+    settings = load_config().get("warehouse") or {}
+    if months_ahead is None:
+        months_ahead = int(settings.get("partition_months_ahead", DEFAULT_MONTHS_AHEAD))
+    keep_from = configured_retention_start(settings)
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    try:
+        migrated = migrate_to_partitioned(cur)
+
+        # Cover the date dimension, i.e. every date a fact row can reference
+        cur.execute("SELECT MIN(full_date), MAX(full_date) FROM warehouse.dim_date")
+        first, last = cur.fetchone()
+        if first is not None and keep_from:
+            first = max(first, keep_from)
+        created = ensure_partitions(cur, first, last, months_ahead) if first is not None else []
+
+        dropped = drop_partitions_before(cur, keep_from) if keep_from else []
+        conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        raise e
+
+    finally:
+        cur.close()
+        conn.close()
+
+    print(f"✅ fact_sales partitions: {len(migrated)} migrated, {len(created)} created, {len(dropped)} dropped")
+    return {"migrated": migrated, "created": created, "dropped": dropped}
+
+if __name__ == "__main__":
+    # Retention comes only from warehouse.fact_retention_months, which the
+    # fact loader reads too
+    parser = argparse.ArgumentParser(description="Create, attach and retire monthly fact_sales partitions")
+    parser.add_argument("--months-ahead", type=int,
+                        help="Months of empty partitions to keep ahead (default: warehouse.partition_months_ahead)")
+    args = parser.parse_args()
+
+    manage_partitions(args.months_ahead)
@@ -1,4 +1,12 @@
+import sys
 import psycopg2
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.transformation.scd2 import merge_scd2
 
 DB_CONFIG = {
     "host": "localhost",
@@ -11,53 +19,48 @@ DB_CONFIG = {
 def get_connection():
     return psycopg2.connect(**DB_CONFIG)
 
+# Tracked attributes, in the order they are hashed
+CUSTOMER_ATTRIBUTES = [
+    "full_name",
+    "email",
+    "city",
+    "state",
+    "country",
+    "age_group",
+    "customer_segment",
+    "registration_date"
+]
+
+CUSTOMER_SOURCE = """
+    SELECT
+        customer_id,
+        first_name || ' ' || last_name AS full_name,
+        email,
+        city,
+        state,
+        country,
+        age_group,
+        'New' AS customer_segment,
+        registration_date
+    FROM public.customers
+"""
+
 def load_dim_customers():
     conn = get_connection()
     cur = conn.cursor()
 
     print("Loading warehouse.dim_customers...")
 
-    # SAFE delete (not truncate)
-    cur.execute("DELETE FROM warehouse.dim_customers")
-
-    insert_sql = """
-        INSERT INTO warehouse.dim_customers (
-            customer_id,
-            full_name,
-            email,
-            city,
-            state,
-            country,
-            age_group,
-            customer_segment,
-            registration_date,
-            effective_date,
-            end_date,
-            is_current
-        )
-        SELECT
-            customer_id,
-            first_name || ' ' || last_name,
-            email,
-            city,
-            state,
-            country,
-            age_group,
-            'New',
-            registration_date,
-            CURRENT_DATE,
-            NULL,
-            TRUE
-        FROM public.customers;
-    """
-
-    cur.execute(insert_sql)
+    # SCD2 merge: only new and changed customers are written
+    counts = merge_scd2(cur, "dim_customers", "customer_id", CUSTOMER_ATTRIBUTES, CUSTOMER_SOURCE)
     conn.commit()
 
     cur.close()
     conn.close()
 
-    print("✅ dim_customers loaded")
+    print(f"✅ dim_customers loaded: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged")
+    return counts
 
 if __name__ == "__main__":
     load_dim_customers()
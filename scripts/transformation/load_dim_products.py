@@ -1,4 +1,12 @@
+import sys
 import psycopg2
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.transformation.scd2 import merge_scd2
 
 DB_CONFIG = {
     "host": "localhost",
@@ -11,49 +19,45 @@ DB_CONFIG = {
 def get_connection():
     return psycopg2.connect(**DB_CONFIG)
 
+# Tracked attributes, in the order they are hashed
+PRODUCT_ATTRIBUTES = [
+    "product_name",
+    "category",
+    "sub_category",
+    "brand",
+    "price_range"
+]
+
+PRODUCT_SOURCE = """
+    SELECT
+        product_id,
+        product_name,
+        category,
+        sub_category,
+        brand,
+        CASE
+            WHEN price < 500 THEN 'Budget'
+            WHEN price < 2000 THEN 'Mid-range'
+            ELSE 'Premium'
+        END AS price_range
+    FROM public.products
+"""
+
 def load_dim_products():
     conn = get_connection()
     cur = conn.cursor()
 
     print("Loading warehouse.dim_products...")
 
-    cur.execute("DELETE FROM warehouse.dim_products")
-
-    insert_sql = """
-        INSERT INTO warehouse.dim_products (
-            product_id,
-            product_name,
-            category,
-            sub_category,
-            brand,
-            price_range,
-            effective_date,
-            end_date,
-            is_current
-        )
-        SELECT
-            product_id,
-            product_name,
-            category,
-            sub_category,
-            brand,
-            CASE
-                WHEN price < 500 THEN 'Budget'
-                WHEN price < 2000 THEN 'Mid-range'
-                ELSE 'Premium'
-            END AS price_range,
-            CURRENT_DATE,
-            NULL,
-            TRUE
-        FROM public.products;
-    """
-
-    cur.execute(insert_sql)
+    # SCD2 merge: only new and changed products are written
+    counts = merge_scd2(cur, "dim_products", "product_id", PRODUCT_ATTRIBUTES, PRODUCT_SOURCE)
     conn.commit()
 
     cur.close()
     conn.close()
-    print("✅ dim_products loaded")
+    print(f"✅ dim_products loaded: {counts['new']} new, {counts['changed']} changed, "
+          f"{counts['unchanged']} unchanged")
+    return counts
 
 if __name__ == "__main__":
     load_dim_products()
@@ -1,5 +1,19 @@
+import argparse
+import sys
 import psycopg2
-from datetime import datetime
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.transformation.aggregates import FACT_DELTA_RETURNING, create_delta_tables, merge_aggregate_deltas
+from scripts.transformation.fact_partitions import (
+    DEFAULT_MONTHS_AHEAD,
+    configured_retention_start,
+    load_config,
+    prepare_partitions,
+)
 
 DB_CONFIG = {
     "host": "localhost",
@@ -9,64 +23,289 @@ DB_CONFIG = {
     "password": "postgres"
 }
 
+# One row per transaction date loaded into fact_sales: a signature of the
+# source rows it was built from, how many fact rows that produced, and the
+# newest source loaded_at it has seen
+LEDGER_DDL = """
+    CREATE TABLE IF NOT EXISTS warehouse.fact_load_ledger (
+        transaction_date DATE PRIMARY KEY,
+        date_key INTEGER NOT NULL,
+        source_rows BIGINT NOT NULL,
+        signature CHAR(32) NOT NULL,
+        rows_loaded BIGINT NOT NULL,
+        source_loaded_at TIMESTAMP,
+        loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    ALTER TABLE warehouse.fact_load_ledger ADD COLUMN IF NOT EXISTS source_loaded_at TIMESTAMP;
+"""
+
+# Source columns the signature covers; loaded_at and row_hash are bookkeeping
+TRANSACTION_COLUMNS = ("transaction_id", "customer_id", "transaction_date", "transaction_time",
+                       "payment_method", "shipping_address", "total_amount")
+ITEM_COLUMNS = ("item_id", "transaction_id", "product_id", "quantity", "unit_price",
+                "discount_percentage", "line_total", "cost")
+
+# A source item becomes a fact row only when every dimension row it needs
+# exists; planning and loading must agree on that
+DIMENSION_JOINS = """
+            JOIN warehouse.dim_customers dc
+                ON t.customer_id = dc.customer_id AND dc.is_current = TRUE
+            JOIN warehouse.dim_products dp
+                ON ti.product_id = dp.product_id AND dp.is_current = TRUE
+            JOIN warehouse.dim_payment_method pm
+                ON t.payment_method = pm.payment_method_name
+            JOIN warehouse.dim_date d
+                ON d.full_date = t.transaction_date
+"""
+
 def get_connection():
     return psycopg2.connect(**DB_CONFIG)
 
-def load_fact_sales():
-    conn = get_connection()
-    cur = conn.cursor()
+# =========================
+# WINDOW PLANNING
+# =========================
+# Ingestion stamps every public row with loaded_at. Only the dates of rows
+# newer than anything the ledger has seen are candidates, found through the
+# loaded_at indexes, plus ledger dates that left the source. Candidates are
+# fingerprinted and compared with the ledger; those whose fingerprint moved
+# are reloaded, so a wholesale re-delivery of identical rows reloads nothing.
+# A date that lost rows to a missing dimension row is reloaded once more of
+# its rows can join than were loaded, not on every run. Dates before `since`
+# (the partition retention horizon) are left alone.
+def plan_windows(cur, since=None):
+    cur.execute("SELECT MAX(source_loaded_at) FROM warehouse.fact_load_ledger")
+    mark = cur.fetchone()[0]
 
-    print("Loading warehouse.fact_sales...")
+    # Only the short dates are joined, and the ledger says which those are
+    cur.execute(f"""
+        CREATE TEMP TABLE fact_dimension_catchup ON COMMIT DROP AS
+        SELECT l.transaction_date
+        FROM warehouse.fact_load_ledger l
+        JOIN public.transactions t
+            ON t.transaction_date = l.transaction_date
+        JOIN public.transaction_items ti
+            ON ti.transaction_id = t.transaction_id
+        {DIMENSION_JOINS}
+        WHERE l.rows_loaded < l.source_rows
+        GROUP BY l.transaction_date, l.rows_loaded
+        HAVING COUNT(*) > l.rows_loaded
+    """)
 
-    # Clean existing data
-    cur.execute("TRUNCATE TABLE warehouse.fact_sales")
-
-    insert_sql = """
-        INSERT INTO warehouse.fact_sales (
-            date_key,
-            customer_key,
-            product_key,
-            payment_method_key,
-            transaction_id,
-            quantity,
-            unit_price,
-            discount_amount,
-            line_total,
-            profit,
-            created_at
+    # Without a mark (first run, --full, or a ledger from before loaded_at)
+    # every date is a candidate
+    cur.execute("""
+        CREATE TEMP TABLE fact_candidate_dates ON COMMIT DROP AS
+        SELECT t.transaction_date
+        FROM public.transactions t
+        WHERE %(mark)s IS NULL OR t.loaded_at > %(mark)s
+        UNION
+        SELECT t.transaction_date
+        FROM public.transaction_items ti
+        JOIN public.transactions t
+            ON ti.transaction_id = t.transaction_id
+        WHERE ti.loaded_at > %(mark)s
+        UNION
+        SELECT transaction_date
+        FROM fact_dimension_catchup
+        UNION
+        SELECT l.transaction_date
+        FROM warehouse.fact_load_ledger l
+        WHERE NOT EXISTS (
+            SELECT 1 FROM public.transactions t
+            WHERE t.transaction_date = l.transaction_date
         )
+    """, {"mark": mark})
+
+    cur.execute(f"""
+        CREATE TEMP TABLE fact_source_signatures ON COMMIT DROP AS
         SELECT
-            d.date_key,
-            dc.customer_key,
-            dp.product_key,
-            pm.payment_method_key,
-            t.transaction_id,
-            ti.quantity,
-            ti.unit_price,
-            (ti.unit_price * ti.quantity * ti.discount_percentage / 100),
-            ti.line_total,
-            (ti.line_total - (ti.cost * ti.quantity)),
-            t.transaction_date
-        FROM public.transaction_items ti
+            t.transaction_date,
+            to_char(t.transaction_date, 'YYYYMMDD')::INTEGER AS date_key,
+            COUNT(*) AS source_rows,
+            md5(string_agg(
+                md5(ROW({", ".join("ti." + c for c in ITEM_COLUMNS)})::text
+                    || ROW({", ".join("t." + c for c in TRANSACTION_COLUMNS)})::text),
+                '' ORDER BY ti.item_id
+            )) AS signature,
+            MAX(GREATEST(ti.loaded_at, t.loaded_at)) AS source_loaded_at
+        FROM fact_candidate_dates c
         JOIN public.transactions t
+            ON t.transaction_date = c.transaction_date
+        JOIN public.transaction_items ti
             ON ti.transaction_id = t.transaction_id
-        JOIN warehouse.dim_customers dc
-            ON t.customer_id = dc.customer_id AND dc.is_current = TRUE
-        JOIN warehouse.dim_products dp
-            ON ti.product_id = dp.product_id AND dp.is_current = TRUE
-        JOIN warehouse.dim_payment_method pm
-            ON t.payment_method = pm.payment_method_name
-        JOIN warehouse.dim_date d
-            ON d.full_date = t.transaction_date;
-    """
+        GROUP BY t.transaction_date
+    """)
+
+    cur.execute("""
+        CREATE TEMP TABLE fact_windows ON COMMIT DROP AS
+        SELECT
+            c.transaction_date,
+            COALESCE(s.date_key, l.date_key) AS date_key
+        FROM fact_candidate_dates c
+        LEFT JOIN fact_source_signatures s
+            ON s.transaction_date = c.transaction_date
+        LEFT JOIN warehouse.fact_load_ledger l
+            ON l.transaction_date = c.transaction_date
+        WHERE (s.signature IS DISTINCT FROM l.signature
+               OR c.transaction_date IN (SELECT transaction_date FROM fact_dimension_catchup))
+          AND c.transaction_date >= COALESCE(%s, '-infinity'::DATE)
+    """, (since,))
+    return cur.rowcount
+
+# =========================
+# WINDOW REPLACEMENT
+# =========================
+# Delete and insert run in the caller's transaction: readers keep seeing the
+# old rows of a window until the new ones commit, never an empty table. The
+# removed and added rows are kept in fact_removed / fact_added so the
+# aggregates can be merged from them.
+def replace_windows(cur):
+    create_delta_tables(cur)
+
+    cur.execute(f"""
+        WITH removed AS (
+            DELETE FROM warehouse.fact_sales
+            WHERE date_key IN (SELECT date_key FROM fact_windows)
+            {FACT_DELTA_RETURNING}
+        )
+        INSERT INTO fact_removed
+        SELECT * FROM removed
+    """)
+    deleted = cur.rowcount
+
+    cur.execute(f"""
+        WITH inserted AS (
+            INSERT INTO warehouse.fact_sales (
+                date_key,
+                customer_key,
+                product_key,
+                payment_method_key,
+                transaction_id,
+                quantity,
+                unit_price,
+                discount_amount,
+                line_total,
+                profit,
+                created_at
+            )
+            SELECT
+                d.date_key,
+                dc.customer_key,
+                dp.product_key,
+                pm.payment_method_key,
+                t.transaction_id,
+                ti.quantity,
+                ti.unit_price,
+                (ti.unit_price * ti.quantity * ti.discount_percentage / 100),
+                ti.line_total,
+                (ti.line_total - (ti.cost * ti.quantity)),
+                t.transaction_date
+            FROM public.transaction_items ti
+            JOIN public.transactions t
+                ON ti.transaction_id = t.transaction_id
+            JOIN fact_windows w
+                ON w.transaction_date = t.transaction_date
+            {DIMENSION_JOINS}
+            {FACT_DELTA_RETURNING}
+        )
+        INSERT INTO fact_added
+        SELECT * FROM inserted
+    """)
+    inserted = cur.rowcount
+
+    cur.execute("ANALYZE fact_removed")
+    cur.execute("ANALYZE fact_added")
+    return deleted, inserted
+
+def record_windows(cur):
+    cur.execute("""
+        INSERT INTO warehouse.fact_load_ledger
+        (transaction_date, date_key, source_rows, signature, rows_loaded, source_loaded_at, loaded_at)
+        SELECT s.transaction_date, s.date_key, s.source_rows, s.signature,
+               COALESCE(f.rows_loaded, 0), s.source_loaded_at, CURRENT_TIMESTAMP
+        FROM fact_windows w
+        JOIN fact_source_signatures s
+            ON s.transaction_date = w.transaction_date
+        LEFT JOIN (
+            SELECT date_key, COUNT(*) AS rows_loaded
+            FROM fact_added
+            GROUP BY date_key
+        ) f
+            ON f.date_key = w.date_key
+        ON CONFLICT (transaction_date) DO UPDATE SET
+            source_rows = EXCLUDED.source_rows,
+            signature = EXCLUDED.signature,
+            rows_loaded = EXCLUDED.rows_loaded,
+            source_loaded_at = EXCLUDED.source_loaded_at,
+            loaded_at = EXCLUDED.loaded_at
+    """)
+
+    # Candidates re-delivered unchanged were not reloaded, but were seen:
+    # moving their mark keeps the next run from signing them again
+    cur.execute("""
+        UPDATE warehouse.fact_load_ledger l
+        SET source_loaded_at = s.source_loaded_at
+        FROM fact_source_signatures s
+        WHERE l.transaction_date = s.transaction_date
+          AND l.source_loaded_at IS DISTINCT FROM s.source_loaded_at
+    """)
+
+    # Dates gone from the source were emptied above; forget them
+    cur.execute("""
+        DELETE FROM warehouse.fact_load_ledger l
+        USING fact_windows w
+        WHERE l.transaction_date = w.transaction_date
+          AND NOT EXISTS (
+              SELECT 1 FROM fact_source_signatures s
+              WHERE s.transaction_date = w.transaction_date
+          )
+    """)
+
+# Monthly partitions must exist before the windows are written into them
+def prepare_window_partitions(cur, months_ahead):
+    cur.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM fact_windows")
+    first, last = cur.fetchone()
+    if first is None:
+        return []
+    return prepare_partitions(cur, first, last, months_ahead)
+
+def load_fact_sales(full=False):
+    settings = load_config().get("warehouse") or {}
+    months_ahead = int(settings.get("partition_months_ahead", DEFAULT_MONTHS_AHEAD))
+    since = configured_retention_start(settings)
+
+    conn = get_connection()
+    cur = conn.cursor()
+
+    print("Loading warehouse.fact_sales...")
+
+    try:
+        cur.execute(LEDGER_DDL)
+        if full:
+            # Forgetting every window makes each date reload
+            cur.execute("DELETE FROM warehouse.fact_load_ledger")
+
+        windows = plan_windows(cur, since)
+        prepare_window_partitions(cur, months_ahead)
+        deleted, inserted = replace_windows(cur)
+        record_windows(cur)
+        aggregates = merge_aggregate_deltas(cur)
+        conn.commit()
 
-    cur.execute(insert_sql)
-    conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
 
-    cur.close()
-    conn.close()
+    finally:
+        cur.close()
+        conn.close()
 
-    print("✅ warehouse.fact_sales loaded successfully")
+    print(f"✅ warehouse.fact_sales loaded: {windows} date windows replaced "
+          f"({deleted} rows removed, {inserted} rows inserted, aggregates {aggregates})")
+    return {"windows": windows, "deleted": deleted, "inserted": inserted, "aggregates": aggregates}
 
 if __name__ == "__main__":
-    load_fact_sales()
+    parser = argparse.ArgumentParser(description="Load warehouse.fact_sales for the transaction dates that changed")
+    parser.add_argument("--full", action="store_true",
+                        help="Reload every transaction date, not just those whose source rows changed")
+    load_fact_sales(parser.parse_args().full)
@@ -1,6 +1,18 @@
+import argparse
+import sys
 import psycopg2
-from datetime import date, timedelta
-import calendar
+import yaml
+from datetime import timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.transformation.aggregates import rebuild_aggregates
+
+CONFIG_PATH = BASE_DIR / "config" / "config.yaml"
+DEFAULT_DATE_HORIZON_DAYS = 365
 
 def get_connection():
     return psycopg2.connect(
@@ -13,36 +25,70 @@ def get_connection():
 # =========================
 # DATE DIMENSION
 # =========================
+# One set-based statement per date range. FM drops to_char's padding; Month
+# and Day are not localized without the TM prefix, so names stay English as
+# calendar.month_name/day_name gave them. ISO week, as date.isocalendar()
+DATE_DIM_SQL = """
+    INSERT INTO warehouse.dim_date
+    (date_key, full_date, year, quarter, month, day,
+     month_name, day_name, week_of_year, is_weekend, is_holiday)
+    SELECT
+        to_char(d, 'YYYYMMDD')::INTEGER,
+        d::DATE,
+        EXTRACT(YEAR FROM d)::INTEGER,
+        EXTRACT(QUARTER FROM d)::INTEGER,
+        EXTRACT(MONTH FROM d)::INTEGER,
+        EXTRACT(DAY FROM d)::INTEGER,
+        to_char(d, 'FMMonth'),
+        to_char(d, 'FMDay'),
+        EXTRACT(WEEK FROM d)::INTEGER,
+        EXTRACT(ISODOW FROM d) >= 6,
+        FALSE
+    FROM generate_series(%s::DATE, %s::DATE, INTERVAL '1 day') AS d
+    ON CONFLICT (date_key) DO NOTHING
+"""
+
 def build_dim_date(start_date, end_date, conn):
     cur = conn.cursor()
-    current = start_date
+    cur.execute(DATE_DIM_SQL, (start_date, end_date))
+    conn.commit()
+    cur.close()
 
-    while current <= end_date:
-        date_key = int(current.strftime("%Y%m%d"))
-        cur.execute("""
-            INSERT INTO warehouse.dim_date
-            (date_key, full_date, year, quarter, month, day,
-             month_name, day_name, week_of_year, is_weekend, is_holiday)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-            ON CONFLICT (date_key) DO NOTHING
-        """, (
-            date_key,
-            current,
-            current.year,
-            (current.month - 1)//3 + 1,
-            current.month,
-            current.day,
-            calendar.month_name[current.month],
-            calendar.day_name[current.weekday()],
-            current.isocalendar()[1],
-            current.weekday() >= 5,
-            False
-        ))
-        current += timedelta(days=1)
+# Ranges still missing from a contiguous dim_date covering existing, to cover wanted
+def missing_edges(existing, wanted):
+    start, end = wanted
+    if existing is None:
+        return [(start, end)]
 
-    conn.commit()
+    low, high = existing
+    edges = []
+    if start < low:
+        edges.append((start, low - timedelta(days=1)))
+    if end > high:
+        edges.append((high + timedelta(days=1), end))
+    return edges
+
+# Sized from the transactions the fact load reads, plus horizon_days ahead so
+# the next loads find their dates. Later runs only add the missing edges
+def ensure_dim_date(conn, horizon_days=DEFAULT_DATE_HORIZON_DAYS):
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM public.transactions")
+    first, last = cur.fetchone()
+    cur.execute("SELECT MIN(full_date), MAX(full_date) FROM warehouse.dim_date")
+    low, high = cur.fetchone()
     cur.close()
 
+    if first is None:
+        print("No transactions yet, warehouse.dim_date left as is")
+        return []
+
+    edges = missing_edges((low, high) if low else None, (first, last + timedelta(days=horizon_days)))
+    for start_date, end_date in edges:
+        build_dim_date(start_date, end_date, conn)
+        print(f"✅ warehouse.dim_date filled {start_date} to {end_date}")
+
+    return edges
+
 # =========================
 # PAYMENT METHOD DIM
 # =========================
@@ -69,57 +115,40 @@ def load_payment_methods(conn):
 # =========================
 # AGGREGATES
 # =========================
+# load_fact_sales.py merges the aggregates as it replaces date windows;
+# this full recompute is only for bootstrapping or repairing them
 def build_aggregates(conn):
     cur = conn.cursor()
-
-    cur.execute("TRUNCATE warehouse.agg_daily_sales")
-    cur.execute("""
-        INSERT INTO warehouse.agg_daily_sales
-        SELECT date_key,
-               COUNT(DISTINCT transaction_id),
-               SUM(line_total),
-               SUM(profit),
-               COUNT(DISTINCT customer_key)
-        FROM warehouse.fact_sales
-        GROUP BY date_key
-    """)
-
-    cur.execute("TRUNCATE warehouse.agg_product_performance")
-    cur.execute("""
-        INSERT INTO warehouse.agg_product_performance
-        SELECT product_key,
-               SUM(quantity),
-               SUM(line_total),
-               SUM(profit),
-               AVG(discount_amount)
-        FROM warehouse.fact_sales
-        GROUP BY product_key
-    """)
-
-    cur.execute("TRUNCATE warehouse.agg_customer_metrics")
-    cur.execute("""
-        INSERT INTO warehouse.agg_customer_metrics
-        SELECT customer_key,
-               COUNT(DISTINCT transaction_id),
-               SUM(line_total),
-               AVG(line_total),
-               MAX(created_at::DATE)
-        FROM warehouse.fact_sales
-        GROUP BY customer_key
-    """)
-
+    rebuild_aggregates(cur)
     conn.commit()
     cur.close()
 
 # =========================
 # MAIN
 # =========================
+def load_config():
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load warehouse dimensions and aggregates")
+    parser.add_argument("--date-horizon-days", type=int, default=None,
+                        help="Days of dim_date past the newest transaction "
+                             "(default: warehouse.date_horizon_days, else 365)")
+    parser.add_argument("--rebuild-aggregates", action="store_true",
+                        help="Recompute the aggregate tables from all of fact_sales "
+                             "(the fact load normally keeps them up to date)")
+    args = parser.parse_args()
+    horizon = args.date_horizon_days
+    if horizon is None:
+        horizon = int((load_config().get("warehouse") or {}).get("date_horizon_days", DEFAULT_DATE_HORIZON_DAYS))
+
     conn = get_connection()
 
-    build_dim_date(date(2024,1,1), date(2024,12,31), conn)
+    ensure_dim_date(conn, horizon)
     load_payment_methods(conn)
-    build_aggregates(conn)
+    if args.rebuild_aggregates:
+        build_aggregates(conn)
 
     conn.close()
     print("Warehouse loading completed")
@@ -0,0 +1,66 @@
+# =========================
+# SCD TYPE 2 MERGE
+# =========================
+# Shared by load_dim_customers.py and load_dim_products.py. Each current row
+# carries an md5 of its tracked attributes; a source row whose hash differs
+# closes the current version (end_date, is_current = FALSE) and opens a new
+# one. Unchanged rows are not touched, so surrogate keys stay stable and the
+# work follows churn. end_date is exclusive: the next version starts that day.
+# Keys that disappear from the source keep their current version.
+
+# Hashed as stored in the dimension, so rows loaded before row_hash existed
+# can be backfilled from the dimension itself
+def attribute_hash(attributes):
+    return f"md5(ROW({', '.join(attributes)})::text)"
+
+def prepare_dimension(cur, table, key, attributes):
+    cur.execute(f"ALTER TABLE warehouse.{table} ADD COLUMN IF NOT EXISTS row_hash CHAR(32)")
+    cur.execute(f"""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_{table}_current
+        ON warehouse.{table} ({key}) WHERE is_current
+    """)
+    cur.execute(f"UPDATE warehouse.{table} SET row_hash = {attribute_hash(attributes)} WHERE row_hash IS NULL")
+
+def merge_scd2(cur, table, key, attributes, source_sql):
+    prepare_dimension(cur, table, key, attributes)
+    cols = ", ".join(attributes)
+
+    # Hash the source once; both statements below read it. Schema-qualified,
+    # so a real table named scd2_source on search_path is never dropped
+    cur.execute("DROP TABLE IF EXISTS pg_temp.scd2_source")
+    cur.execute(f"""
+        CREATE TEMP TABLE scd2_source ON COMMIT DROP AS
+        SELECT {key}, {cols}, {attribute_hash(attributes)} AS row_hash
+        FROM ({source_sql}) src
+    """)
+    source_rows = cur.rowcount
+    cur.execute("ANALYZE scd2_source")
+
+    cur.execute(f"""
+        UPDATE warehouse.{table} d
+        SET end_date = CURRENT_DATE,
+            is_current = FALSE
+        FROM scd2_source s
+        WHERE d.{key} = s.{key}
+          AND d.is_current
+          AND d.row_hash IS DISTINCT FROM s.row_hash
+    """)
+    changed = cur.rowcount
+
+    # New keys and the keys just closed have no current version now
+    cur.execute(f"""
+        INSERT INTO warehouse.{table} ({key}, {cols}, row_hash, effective_date, end_date, is_current)
+        SELECT s.{key}, {", ".join("s." + a for a in attributes)}, s.row_hash, CURRENT_DATE, NULL, TRUE
+        FROM scd2_source s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM warehouse.{table} d
+            WHERE d.{key} = s.{key} AND d.is_current
+        )
+    """)
+    inserted = cur.rowcount
+
+    return {
+        "new": inserted - changed,
+        "changed": changed,
+        "unchanged": source_rows - inserted
+    }
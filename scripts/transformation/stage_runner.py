@@ -0,0 +1,36 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Production tables in foreign-key order, each with the stages whose output
+# its checks read. The dimensions depend on nothing, so they load side by side
+STAGE_DEPENDENCIES = {
+    "customers": (),
+    "products": (),
+    "transactions": ("customers",),
+    "transaction_items": ("transactions", "products"),
+}
+
+# -------------------------------
+# Dependency-ordered Runner
+# -------------------------------
+# Starts every stage whose dependencies have finished, up to `workers` at a
+# time, and returns {stage: run(stage)}. A failed stage raises out of here:
+# stages already running are left to finish, nothing new is started.
+def run_in_dependency_order(run, dependencies, workers):
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while len(results) < len(dependencies):
+            for stage, parents in dependencies.items():
+                if stage not in running and stage not in results and all(p in results for p in parents):
+                    running[stage] = executor.submit(run, stage)
+
+            if not running:
+                raise ValueError(f"Stages {sorted(set(dependencies) - set(results))} wait on each other "
+                                 f"or on unknown stages")
+
+            finished, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+            for stage in [s for s, f in running.items() if f in finished]:
+                results[stage] = running.pop(stage).result()
+
+    return results
@@ -1,48 +1,55 @@
+import argparse
 import psycopg2
 import json
+import sys
+import pandas as pd
+import yaml
 from datetime import datetime
-from decimal import Decimal
+from pathlib import Path
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+BASE_DIR = Path(__file__).resolve().parents[2]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from scripts.transformation.cleansing import (
+    calculate_profit_margin_batch,
+    normalize_email_batch,
+    normalize_phone_batch,
+    normalize_text_batch,
+    price_category_batch,
+    round_cents,
+    title_case_batch,
+)
+from scripts.transformation.watermarks import (
+    FACT_KEYS,
+    PIPELINE_STATE_DDL,
+    close_window,
+    describe,
+    plan_windows,
+    reconcile_due,
+)
+from scripts.transformation.stage_runner import STAGE_DEPENDENCIES, run_in_dependency_order
+
+CONFIG_PATH = BASE_DIR / "config" / "config.yaml"
+MODES = ("python", "sql")
+DEFAULT_BATCH_SIZE = 1000
 
 # -------------------------------
 # Database Connection
 # -------------------------------
-def get_connection():
-    return psycopg2.connect(
-        host="localhost",
-        database="ecommerce",
-        user="postgres",
-        password="postgres"
-    )
-
-# -------------------------------
-# Cleansing Utilities
-# -------------------------------
-def normalize_text(val):
-    return val.strip() if val else None
-
-def normalize_email(email):
-    return email.lower().strip() if email else None
+DB_CONFIG = {
+    "host": "localhost",
+    "database": "ecommerce",
+    "user": "postgres",
+    "password": "postgres"
+}
 
-def normalize_phone(phone):
-    return ''.join(filter(str.isdigit, phone)) if phone else None
-
-def title_case(val):
-    return val.title() if val else None
-
-# -------------------------------
-# Enrichment Logic
-# -------------------------------
-def calculate_profit_margin(price, cost):
-    if price is None or cost is None or price <= 0:
-        return None
-    return round(((price - cost) / price) * 100, 2)
+def get_connection():
+    return psycopg2.connect(**DB_CONFIG)
 
-def price_category(price):
-    if price < 50:
-        return "Budget"
-    elif price < 200:
-        return "Mid-range"
-    return "Premium"
+# Cleansing and enrichment functions live in cleansing.py
 
 # -------------------------------
 # Business Rules
@@ -54,161 +61,639 @@ def valid_item(quantity):
     return quantity is not None and quantity > 0
 
 # -------------------------------
-# Load Customers (DIMENSION)
+# Streaming (server-side cursor -> batched writes)
 # -------------------------------
-def load_customers(cur, summary):
-    cur.execute("SELECT * FROM staging.customers")
-    rows = cur.fetchall()
+# A named cursor keeps the result set in Postgres and hands it over
+# batch_size rows at a time, so memory stays flat whatever the table size.
+# Writes go back on the regular cursor with execute_values, one round trip
+# per batch. The cursor's snapshot is fixed when it opens, so rows written
+# meanwhile never show up in it.
+def stream_batches(cur, name, query, batch_size, params=None):
+    with cur.connection.cursor(name=name) as source:
+        source.itersize = batch_size
+        source.execute(query, params)
+        while True:
+            rows = source.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+# Rows as psycopg2 wants them: NaN/NaT become NULL
+def db_rows(frame):
+    return list(frame.astype(object).where(frame.notna(), None).itertuples(index=False, name=None))
 
-    inserted = 0
-    cur.execute("TRUNCATE production.customers")
-
-    for r in rows:
-        cur.execute("""
-            INSERT INTO production.customers
-            (customer_id, first_name, last_name, email, phone, city, state, country, created_at)
-            VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            r[0],
-            title_case(normalize_text(r[1])),
-            title_case(normalize_text(r[2])),
-            normalize_email(r[3]),
-            normalize_phone(r[4]),
-            normalize_text(r[6]),
-            normalize_text(r[7]),
-            normalize_text(r[8]),
-            r[5]
-        ))
-        inserted += 1
+# -------------------------------
+# Dimension Merge (hash-diff upsert)
+# -------------------------------
+# Each dimension row carries an md5 of its cleansed attributes. A re-sent row
+# is rewritten, and its updated_at bumped, only when that hash differs, so
+# nightly writes follow churn rather than table size. Both modes hash with
+# the same expression over columns cast to their production types, and
+# cleansing.py rounds money and margins half away from zero from the staged
+# values, as round(numeric, 2) does in SQL, so a row cleansed in Python and
+# one cleansed in SQL hash alike. Rows loaded before row_hash existed have
+# no hash yet and are rewritten once.
+CUSTOMER_HASH = """md5(ROW(first_name, last_name, email, phone, registration_date::date,
+                          city, state, country, age_group)::text)"""
+
+PRODUCT_HASH = """md5(ROW(product_name, category, sub_category, price::numeric(10,2), cost::numeric(10,2), brand,
+                         stock_quantity::integer, supplier_id, profit_margin::numeric(7,2),
+                         price_category)::text)"""
+
+CUSTOMER_MERGE = """
+    ON CONFLICT (customer_id) DO UPDATE SET
+        first_name = EXCLUDED.first_name,
+        last_name = EXCLUDED.last_name,
+        email = EXCLUDED.email,
+        phone = EXCLUDED.phone,
+        registration_date = EXCLUDED.registration_date,
+        city = EXCLUDED.city,
+        state = EXCLUDED.state,
+        country = EXCLUDED.country,
+        age_group = EXCLUDED.age_group,
+        row_hash = EXCLUDED.row_hash,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE t.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING (xmax = 0) AS is_new
+"""
+
+PRODUCT_MERGE = """
+    ON CONFLICT (product_id) DO UPDATE SET
+        product_name = EXCLUDED.product_name,
+        category = EXCLUDED.category,
+        sub_category = EXCLUDED.sub_category,
+        price = EXCLUDED.price,
+        cost = EXCLUDED.cost,
+        brand = EXCLUDED.brand,
+        stock_quantity = EXCLUDED.stock_quantity,
+        supplier_id = EXCLUDED.supplier_id,
+        profit_margin = EXCLUDED.profit_margin,
+        price_category = EXCLUDED.price_category,
+        row_hash = EXCLUDED.row_hash,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE t.row_hash IS DISTINCT FROM EXCLUDED.row_hash
+    RETURNING (xmax = 0) AS is_new
+"""
+
+ROW_HASHES = {"customers": CUSTOMER_HASH, "products": PRODUCT_HASH}
+MERGES = {"customers": CUSTOMER_MERGE, "products": PRODUCT_MERGE}
+DIMENSIONS = tuple(MERGES)
+
+# RETURNING only sees rows actually written; the rest were unchanged
+def count_changes(counts, returned, total):
+    inserted = sum(1 for (is_new,) in returned if is_new)
+    counts["inserted"] += inserted
+    counts["updated"] += len(returned) - inserted
+    counts["unchanged"] += total - len(returned)
+
+# -------------------------------
+# Load Customers (DIMENSION)
+# -------------------------------
+CUSTOMER_COLUMNS = ["customer_id", "first_name", "last_name", "email", "phone", "registration_date",
+                    "city", "state", "country", "age_group"]
+
+def clean_customers(rows):
+    frame = pd.DataFrame(rows, columns=CUSTOMER_COLUMNS)
+    frame["first_name"] = title_case_batch(normalize_text_batch(frame["first_name"]))
+    frame["last_name"] = title_case_batch(normalize_text_batch(frame["last_name"]))
+    frame["email"] = normalize_email_batch(frame["email"])
+    frame["phone"] = normalize_phone_batch(frame["phone"])
+    for column in ("city", "state", "country"):
+        frame[column] = normalize_text_batch(frame[column])
+    return frame
+
+# Dimensions are merged, as in SQL mode: truncating them would break the fact foreign keys.
+# The VALUES list is cast to the production types so the hash matches SQL mode.
+# With a target work table the rows are only staged there; the merge happens at publish
+CUSTOMER_TEMPLATE = "(%s, %s, %s, %s, %s, %s::date, %s, %s, %s, %s)"
+
+def load_customers(cur, summary, batch_size=DEFAULT_BATCH_SIZE, target=None):
+    total = 0
+    changes = {"inserted": 0, "updated": 0, "unchanged": 0}
+    merge = "" if target else CUSTOMER_MERGE
+
+    for rows in stream_batches(cur, "staging_customers", """
+        SELECT customer_id, first_name, last_name, email, phone, registration_date, city, state, country, age_group
+        FROM staging.customers
+    """, batch_size):
+        returned = execute_values(cur, f"""
+            INSERT INTO {target or "production.customers"} AS t
+            (customer_id, first_name, last_name, email, phone, registration_date, city, state, country, age_group,
+             row_hash)
+            SELECT v.*, {CUSTOMER_HASH}
+            FROM (VALUES %s) AS v
+            (customer_id, first_name, last_name, email, phone, registration_date, city, state, country, age_group)
+            {merge}
+        """, db_rows(clean_customers(rows)), template=CUSTOMER_TEMPLATE, page_size=batch_size, fetch=bool(merge))
+        if merge:
+            count_changes(changes, returned, len(rows))
+        total += len(rows)
 
     summary["customers"] = {
-        "input": len(rows),
-        "output": inserted,
+        "input": total,
+        "output": total,
         "filtered": 0,
         "rejected_reasons": {}
     }
+    if merge:
+        summary["customers"]["changes"] = changes
 
 # -------------------------------
 # Load Products (DIMENSION)
 # -------------------------------
-def load_products(cur, summary):
-    cur.execute("SELECT * FROM staging.products")
-    rows = cur.fetchall()
-
-    cur.execute("TRUNCATE production.products")
-    inserted = 0
-
-    for r in rows:
-        margin = calculate_profit_margin(r[3], r[4])
-        category = price_category(r[3])
-
-        cur.execute("""
-            INSERT INTO production.products
-            (product_id, name, category, price, cost, profit_margin, price_category)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            r[0],
-            normalize_text(r[1]),
-            normalize_text(r[2]),
-            round(Decimal(r[3]), 2),
-            round(Decimal(r[4]), 2),
-            margin,
-            category
-        ))
-        inserted += 1
+PRODUCT_COLUMNS = ["product_id", "product_name", "category", "sub_category", "price", "cost", "brand",
+                   "stock_quantity", "supplier_id"]
+
+def clean_products(rows):
+    frame = pd.DataFrame(rows, columns=PRODUCT_COLUMNS)
+    for column in ("product_name", "category", "sub_category", "brand"):
+        frame[column] = normalize_text_batch(frame[column])
+    # Enriched from the staged values, before price and cost are rounded
+    frame["profit_margin"] = calculate_profit_margin_batch(frame["price"], frame["cost"])
+    frame["price_category"] = price_category_batch(frame["price"])
+    frame["price"] = frame["price"].map(round_cents)
+    frame["cost"] = frame["cost"].map(round_cents)
+    return frame
+
+PRODUCT_TEMPLATE = "(%s, %s, %s, %s, %s::numeric(10,2), %s::numeric(10,2), %s, %s::integer, %s, %s::numeric(7,2), %s)"
+
+def load_products(cur, summary, batch_size=DEFAULT_BATCH_SIZE, target=None):
+    total = 0
+    changes = {"inserted": 0, "updated": 0, "unchanged": 0}
+    merge = "" if target else PRODUCT_MERGE
+
+    for rows in stream_batches(cur, "staging_products", """
+        SELECT product_id, product_name, category, sub_category, price, cost, brand, stock_quantity, supplier_id
+        FROM staging.products
+    """, batch_size):
+        returned = execute_values(cur, f"""
+            INSERT INTO {target or "production.products"} AS t
+            (product_id, product_name, category, sub_category, price, cost, brand, stock_quantity, supplier_id,
+             profit_margin, price_category, row_hash)
+            SELECT v.*, {PRODUCT_HASH}
+            FROM (VALUES %s) AS v
+            (product_id, product_name, category, sub_category, price, cost, brand, stock_quantity, supplier_id,
+             profit_margin, price_category)
+            {merge}
+        """, db_rows(clean_products(rows)), template=PRODUCT_TEMPLATE, page_size=batch_size, fetch=bool(merge))
+        if merge:
+            count_changes(changes, returned, len(rows))
+        total += len(rows)
 
     summary["products"] = {
-        "input": len(rows),
-        "output": inserted,
+        "input": total,
+        "output": total,
         "filtered": 0,
         "rejected_reasons": {}
     }
+    if merge:
+        summary["products"]["changes"] = changes
 
 # -------------------------------
 # Load Transactions (FACT – INCREMENTAL)
 # -------------------------------
-def load_transactions(cur, summary):
-    cur.execute("""
-        SELECT s.*
+# The anti-join only drops ids already in production; the watermark window
+# (see watermarks.py) keeps an incremental run from scanning all of staging
+def load_transactions(cur, summary, batch_size=DEFAULT_BATCH_SIZE, window=None, target=None):
+    total = 0
+    inserted = 0
+
+    for rows in stream_batches(cur, "staging_transactions", f"""
+        SELECT s.transaction_id, s.customer_id, s.transaction_date, s.transaction_time,
+               s.payment_method, s.shipping_address, s.total_amount
         FROM staging.transactions s
         LEFT JOIN production.transactions p
         ON s.transaction_id = p.transaction_id
         WHERE p.transaction_id IS NULL
-    """)
-    rows = cur.fetchall()
-
-    inserted = 0
-    rejected = 0
+        {window["sql"] if window else ""}
+    """, batch_size, window["params"] if window else None):
+        valid = [r for r in rows if valid_transaction(r[6])]
 
-    for r in rows:
-        if not valid_transaction(r[3]):
-            rejected += 1
-            continue
+        execute_values(cur, f"""
+            INSERT INTO {target or "production.transactions"}
+            (transaction_id, customer_id, transaction_date, transaction_time, payment_method, shipping_address,
+             total_amount)
+            VALUES %s
+        """, valid, page_size=batch_size)
 
-        cur.execute("""
-            INSERT INTO production.transactions
-            (transaction_id, customer_id, transaction_date, total_amount)
-            VALUES (%s,%s,%s,%s)
-        """, (r[0], r[1], r[2], r[3]))
-
-        inserted += 1
+        total += len(rows)
+        inserted += len(valid)
 
     summary["transactions"] = {
-        "input": len(rows),
+        "input": total,
         "output": inserted,
-        "filtered": rejected,
-        "rejected_reasons": {"invalid_total_amount": rejected}
+        "filtered": total - inserted,
+        "rejected_reasons": {"invalid_total_amount": total - inserted}
     }
 
 # -------------------------------
 # Load Transaction Items (FACT)
 # -------------------------------
-def load_transaction_items(cur, summary):
-    cur.execute("""
-        SELECT s.*
+def load_transaction_items(cur, summary, batch_size=DEFAULT_BATCH_SIZE, window=None, target=None):
+    total = 0
+    inserted = 0
+
+    for rows in stream_batches(cur, "staging_transaction_items", f"""
+        SELECT s.item_id, s.transaction_id, s.product_id, s.quantity, s.unit_price, s.discount_percentage
         FROM staging.transaction_items s
         LEFT JOIN production.transaction_items p
         ON s.item_id = p.item_id
         WHERE p.item_id IS NULL
-    """)
-    rows = cur.fetchall()
-
-    inserted = 0
-    rejected = 0
-
-    for r in rows:
-        if not valid_item(r[3]):
-            rejected += 1
-            continue
-
+        {window["sql"] if window else ""}
+    """, batch_size, window["params"] if window else None):
         # Recalculate line total
-        line_total = round(
-            r[3] * r[4] * (1 - (r[5] / 100)), 2
-        )
+        valid = [
+            (r[0], r[1], r[2], r[3], r[4], r[5], round(r[3] * r[4] * (1 - (r[5] / 100)), 2))
+            for r in rows if valid_item(r[3])
+        ]
 
-        cur.execute("""
-            INSERT INTO production.transaction_items
-            (item_id, transaction_id, product_id, quantity, unit_price, discount, line_total)
-            VALUES (%s,%s,%s,%s,%s,%s,%s)
-        """, (
-            r[0], r[1], r[2], r[3], r[4], r[5], line_total
-        ))
+        execute_values(cur, f"""
+            INSERT INTO {target or "production.transaction_items"}
+            (item_id, transaction_id, product_id, quantity, unit_price, discount_percentage, line_total)
+            VALUES %s
+        """, valid, page_size=batch_size)
 
-        inserted += 1
+        total += len(rows)
+        inserted += len(valid)
 
     summary["transaction_items"] = {
-        "input": len(rows),
+        "input": total,
         "output": inserted,
-        "filtered": rejected,
-        "rejected_reasons": {"invalid_quantity": rejected}
+        "filtered": total - inserted,
+        "rejected_reasons": {"invalid_quantity": total - inserted}
     }
 
 # -------------------------------
-# MAIN ETL DRIVER
+# SQL Push-down (one INSERT ... SELECT per table)
 # -------------------------------
-def run_etl():
+# Columns the product enrichment and the dimension merge write, for databases
+# created before they existed
+ENRICHMENT_DDL = """
+    ALTER TABLE production.products
+        ADD COLUMN IF NOT EXISTS profit_margin DECIMAL(7,2),
+        ADD COLUMN IF NOT EXISTS price_category VARCHAR(20),
+        ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+    ALTER TABLE production.customers
+        ADD COLUMN IF NOT EXISTS row_hash CHAR(32);
+"""
+
+# Each statement cleanses, enriches and filters inside Postgres. A CTE tags
+# every source row with its first failed rule (NULL = keep), the INSERT takes
+# the untagged rows, and the final SELECT returns input/output counts plus the
+# per-reason rejections for transformation_summary.json. Dimension merges
+# skip unchanged rows, so "inserted" holds only what was written; its is_new
+# flag splits that into inserts and updates. initcap() matches str.title()
+# except after digits ("3rd" stays "3rd").
+PUSHDOWN_COUNTS = """
+    SELECT
+        (SELECT COUNT(*) FROM checked),
+        (SELECT COUNT(*) FROM checked WHERE reject_reason IS NULL),
+        (SELECT COALESCE(json_object_agg(reject_reason, n), '{}')
+         FROM (SELECT reject_reason, COUNT(*) AS n FROM checked
+               WHERE reject_reason IS NOT NULL GROUP BY reject_reason) r),
+        (SELECT COUNT(*) FILTER (WHERE is_new) FROM inserted),
+        (SELECT COUNT(*) FILTER (WHERE NOT is_new) FROM inserted)
+"""
+
+PUSHDOWN_SQL = {
+    # Dimensions are merged: truncating them would break the fact foreign keys
+    "customers": (r"""
+        WITH cleaned AS (
+            SELECT
+                customer_id,
+                initcap(btrim(first_name)) AS first_name,
+                initcap(btrim(last_name)) AS last_name,
+                lower(btrim(email)) AS email,
+                regexp_replace(phone, '\D', '', 'g') AS phone,
+                registration_date,
+                btrim(city) AS city,
+                btrim(state) AS state,
+                btrim(country) AS country,
+                age_group
+            FROM staging.customers
+        ),
+        checked AS (
+            SELECT cleaned.*,
+                CASE
+                    WHEN email IS NULL OR email = '' THEN 'missing_email'
+                    WHEN first_name IS NULL OR last_name IS NULL OR registration_date IS NULL
+                        THEN 'missing_required_field'
+                    WHEN ROW_NUMBER() OVER (PARTITION BY email ORDER BY customer_id) > 1 THEN 'duplicate_email'
+                END AS reject_reason
+            FROM cleaned
+        ),
+        inserted AS (
+            INSERT INTO {target} AS t
+            (customer_id, first_name, last_name, email, phone, registration_date, city, state, country, age_group,
+             row_hash)
+            SELECT customer_id, first_name, last_name, email, phone, registration_date, city, state, country, age_group,
+                   {row_hash}
+            FROM checked
+            WHERE reject_reason IS NULL
+            {merge}
+        )
+    """, ["missing_email", "missing_required_field", "duplicate_email"]),
+
+    "products": ("""
+        WITH checked AS (
+            SELECT
+                product_id,
+                btrim(product_name) AS product_name,
+                btrim(category) AS category,
+                btrim(sub_category) AS sub_category,
+                round(price, 2) AS price,
+                round(cost, 2) AS cost,
+                btrim(brand) AS brand,
+                stock_quantity,
+                supplier_id,
+                CASE WHEN price > 0 THEN round((price - cost) / price * 100, 2) END AS profit_margin,
+                CASE
+                    WHEN price < 50 THEN 'Budget'
+                    WHEN price < 200 THEN 'Mid-range'
+                    ELSE 'Premium'
+                END AS price_category,
+                CASE
+                    WHEN price IS NULL OR cost IS NULL OR price < 0 OR cost < 0 OR cost >= price
+                        THEN 'invalid_price_or_cost'
+                    WHEN product_name IS NULL OR category IS NULL OR stock_quantity IS NULL OR stock_quantity < 0
+                        THEN 'missing_required_field'
+                END AS reject_reason
+            FROM staging.products
+        ),
+        inserted AS (
+            INSERT INTO {target} AS t
+            (product_id, product_name, category, sub_category, price, cost, brand, stock_quantity, supplier_id,
+             profit_margin, price_category, row_hash)
+            SELECT product_id, product_name, category, sub_category, price, cost, brand, stock_quantity, supplier_id,
+                   profit_margin, price_category, {row_hash}
+            FROM checked
+            WHERE reject_reason IS NULL
+            {merge}
+        )
+    """, ["invalid_price_or_cost", "missing_required_field"]),
+
+    # Facts stay incremental: only ids not yet in production, within the
+    # watermark window, are considered
+    "transactions": ("""
+        WITH checked AS (
+            SELECT s.transaction_id, s.customer_id, s.transaction_date, s.transaction_time,
+                   btrim(s.payment_method) AS payment_method, btrim(s.shipping_address) AS shipping_address,
+                   s.total_amount,
+                CASE
+                    WHEN s.total_amount IS NULL OR s.total_amount <= 0 THEN 'invalid_total_amount'
+                    WHEN NOT EXISTS (SELECT 1 FROM {customers} c WHERE c.customer_id = s.customer_id)
+                        THEN 'missing_customer'
+                    WHEN s.transaction_date IS NULL OR s.transaction_time IS NULL OR s.payment_method IS NULL
+                        THEN 'missing_required_field'
+                END AS reject_reason
+            FROM staging.transactions s
+            LEFT JOIN production.transactions p ON s.transaction_id = p.transaction_id
+            WHERE p.transaction_id IS NULL
+            {window}
+        ),
+        inserted AS (
+            INSERT INTO {target}
+            (transaction_id, customer_id, transaction_date, transaction_time, payment_method, shipping_address,
+             total_amount)
+            SELECT transaction_id, customer_id, transaction_date, transaction_time, payment_method, shipping_address,
+                   total_amount
+            FROM checked
+            WHERE reject_reason IS NULL
+            {merge}
+        )
+    """, ["invalid_total_amount", "missing_customer", "missing_required_field"]),
+
+    "transaction_items": ("""
+        WITH checked AS (
+            SELECT s.item_id, s.transaction_id, s.product_id, s.quantity, s.unit_price, s.discount_percentage,
+                round(s.quantity * s.unit_price * (1 - COALESCE(s.discount_percentage, 0) / 100), 2) AS line_total,
+                CASE
+                    WHEN s.quantity IS NULL OR s.quantity <= 0 THEN 'invalid_quantity'
+                    WHEN NOT EXISTS (SELECT 1 FROM {transactions} t WHERE t.transaction_id = s.transaction_id)
+                        THEN 'missing_transaction'
+                    WHEN NOT EXISTS (SELECT 1 FROM {products} pr WHERE pr.product_id = s.product_id)
+                        THEN 'missing_product'
+                    WHEN s.discount_percentage NOT BETWEEN 0 AND 100 THEN 'invalid_discount'
+                    WHEN s.unit_price IS NULL OR s.unit_price < 0 THEN 'missing_required_field'
+                END AS reject_reason
+            FROM staging.transaction_items s
+            LEFT JOIN production.transaction_items p ON s.item_id = p.item_id
+            WHERE p.item_id IS NULL
+            {window}
+        ),
+        inserted AS (
+            INSERT INTO {target}
+            (item_id, transaction_id, product_id, quantity, unit_price, discount_percentage, line_total)
+            SELECT item_id, transaction_id, product_id, quantity, unit_price, discount_percentage, line_total
+            FROM checked
+            WHERE reject_reason IS NULL
+            {merge}
+        )
+    """, ["invalid_quantity", "missing_transaction", "missing_product", "invalid_discount",
+          "missing_required_field"])
+}
+
+# Staged runs write into the work tables, so parent lookups must see both
+# what production already holds and what this run's parent stages staged
+def parent_keys(table, staged):
+    if not staged:
+        return f"production.{table}"
+    key = TABLE_KEYS[table]
+    return f"(SELECT {key} FROM production.{table} UNION ALL SELECT {key} FROM {work_table(table)})"
+
+def run_pushdown(cur, table, summary, window=None, staged=False):
+    sql, reasons = PUSHDOWN_SQL[table]
+    merging = table in MERGES and not staged
+
+    sql = sql.format(
+        target=work_table(table) if staged else f"production.{table}",
+        row_hash=ROW_HASHES.get(table, ""),
+        merge=MERGES[table] if merging else "RETURNING TRUE AS is_new",
+        window=window["sql"] if window else "",
+        **{parent: parent_keys(parent, staged) for parent in ("customers", "products", "transactions")}
+    )
+    cur.execute(sql + PUSHDOWN_COUNTS, window["params"] if window else None)
+    total, kept, rejected, inserted, updated = cur.fetchone()
+
+    summary[table] = {
+        "input": total,
+        "output": kept,
+        "filtered": total - kept,
+        "rejected_reasons": {reason: rejected.get(reason, 0) for reason in reasons}
+    }
+    if merging:
+        summary[table]["changes"] = {"inserted": inserted, "updated": updated, "unchanged": kept - inserted - updated}
+
+def load_config():
+    with open(CONFIG_PATH, "r") as f:
+        return yaml.safe_load(f)
+
+# -------------------------------
+# Stage Dispatch (serial run)
+# -------------------------------
+PYTHON_LOADERS = {
+    "customers": load_customers,
+    "products": load_products,
+    "transactions": load_transactions,
+    "transaction_items": load_transaction_items,
+}
+
+def run_stage(cur, table, mode, summary, batch_size, window=None, staged=False):
+    target = work_table(table) if staged else None
+
+    if mode == "sql":
+        run_pushdown(cur, table, summary, window, staged)
+    elif table in FACT_KEYS:
+        PYTHON_LOADERS[table](cur, summary, batch_size, window, target)
+    else:
+        PYTHON_LOADERS[table](cur, summary, batch_size, target)
+
+def run_serial(mode, batch_size, reconcile, records):
     conn = get_connection()
     cur = conn.cursor()
+    windows = {}
+
+    try:
+        cur.execute(ENRICHMENT_DDL)
+        cur.execute(PIPELINE_STATE_DDL)
+
+        # Foreign-key order, with every fact window planned up front
+        planned = plan_windows(cur, reconcile)
+        for table in STAGE_DEPENDENCIES:
+            window = planned.get(table)
+            run_stage(cur, table, mode, records, batch_size, window)
+
+            if window:
+                close_window(cur, table, window, records[table]["input"])
+                windows[table] = window
+
+        conn.commit()
+
+    except Exception as e:
+        conn.rollback()
+        raise e
+
+    finally:
+        cur.close()
+        conn.close()
+
+    return windows
+
+# -------------------------------
+# Concurrent Stages (pooled connections)
+# -------------------------------
+# Each table's cleansing runs on its own pooled connection and lands in an
+# UNLOGGED production.<table>_work table, committed there and invisible to
+# readers of production. In SQL mode the fact checks look up their parents,
+# so they start once those stages are done; Python mode's rules are
+# row-local, so all four stages start at once. When every stage has
+# succeeded, one publish transaction merges the work tables into production
+# in foreign-key order and moves the watermarks, so the run still lands or
+# rolls back as a whole. A failed stage leaves production untouched.
+TABLE_KEYS = {"customers": "customer_id", "products": "product_id", **FACT_KEYS}
+
+def work_table(table):
+    return f"production.{table}_work"
+
+def create_work_tables(cur):
+    for table in STAGE_DEPENDENCIES:
+        cur.execute(f"DROP TABLE IF EXISTS {work_table(table)}")
+        cur.execute(f"CREATE UNLOGGED TABLE {work_table(table)} (LIKE production.{table} INCLUDING DEFAULTS)")
+
+def drop_work_tables(cur):
+    for table in STAGE_DEPENDENCIES:
+        cur.execute(f"DROP TABLE IF EXISTS {work_table(table)}")
+
+def run_staged(pool, table, mode, batch_size, window):
+    conn = pool.getconn()
+    records = {}
+    try:
+        with conn, conn.cursor() as cur:
+            run_stage(cur, table, mode, records, batch_size, window, staged=True)
+        print(f"✅ Staged {table}: {records[table]['output']:,} rows")
+        return records[table], window
+    finally:
+        pool.putconn(conn)
+
+# Work tables are LIKE their production table, so whole rows move across
+def publish_work_tables(cur, records, windows):
+    for table in STAGE_DEPENDENCIES:
+        if table in MERGES:
+            cur.execute(f"""
+                WITH merged AS (
+                    INSERT INTO production.{table} AS t
+                    SELECT * FROM {work_table(table)}
+                    {MERGES[table]}
+                )
+                SELECT COUNT(*) FILTER (WHERE is_new), COUNT(*) FILTER (WHERE NOT is_new) FROM merged
+            """)
+            inserted, updated = cur.fetchone()
+            records[table]["changes"] = {
+                "inserted": inserted,
+                "updated": updated,
+                "unchanged": records[table]["output"] - inserted - updated
+            }
+        else:
+            cur.execute(f"INSERT INTO production.{table} SELECT * FROM {work_table(table)}")
+
+        if windows.get(table):
+            close_window(cur, table, windows[table], records[table]["input"])
+
+    drop_work_tables(cur)
+
+def run_concurrent(mode, batch_size, reconcile, records, workers):
+    pool = ThreadedConnectionPool(1, workers, **DB_CONFIG)
+    dependencies = STAGE_DEPENDENCIES if mode == "sql" else dict.fromkeys(STAGE_DEPENDENCIES, ())
+
+    try:
+        conn = pool.getconn()
+        try:
+            with conn, conn.cursor() as cur:
+                cur.execute(ENRICHMENT_DDL)
+                cur.execute(PIPELINE_STATE_DDL)
+                create_work_tables(cur)
+                planned = plan_windows(cur, reconcile)
+        finally:
+            pool.putconn(conn)
+
+        try:
+            staged = run_in_dependency_order(
+                lambda table: run_staged(pool, table, mode, batch_size, planned.get(table)), dependencies, workers)
+            windows = {table: window for table, (_, window) in staged.items()}
+            for table in STAGE_DEPENDENCIES:
+                records[table] = staged[table][0]
+
+            conn = pool.getconn()
+            try:
+                with conn, conn.cursor() as cur:
+                    publish_work_tables(cur, records, windows)
+            finally:
+                pool.putconn(conn)
+
+        except Exception:
+            conn = pool.getconn()
+            try:
+                with conn, conn.cursor() as cur:
+                    drop_work_tables(cur)
+            finally:
+                pool.putconn(conn)
+            raise
+
+    finally:
+        pool.closeall()
+
+    return {table: window for table, window in windows.items() if window}
+
+# -------------------------------
+# MAIN ETL DRIVER
+# -------------------------------
+def run_etl(mode=None, reconcile=False, workers=None):
+    config = load_config()
+    settings = config.get("transformation") or {}
+    mode = mode or settings.get("mode", "python")
+    reconcile = reconcile or reconcile_due(settings.get("reconcile_day"))
+    workers = workers or int(settings.get("workers", 1))
+    batch_size = int(config["pipeline"].get("batch_size", DEFAULT_BATCH_SIZE))
 
     summary = {
         "transformation_timestamp": datetime.utcnow().isoformat(),
@@ -220,6 +705,7 @@ def run_etl():
             "profit_margin_calculation",
             "price_category_assignment",
             "business_rule_filtering",
+            "hash_diff_dimension_merge",
             "incremental_fact_loading"
         ],
         "data_quality_post_transform": {
@@ -228,21 +714,15 @@ def run_etl():
         }
     }
 
-    try:
-        load_customers(cur, summary["records_processed"])
-        load_products(cur, summary["records_processed"])
-        load_transactions(cur, summary["records_processed"])
-        load_transaction_items(cur, summary["records_processed"])
+    summary["execution_mode"] = mode
+    summary["workers"] = workers
 
-        conn.commit()
-
-    except Exception as e:
-        conn.rollback()
-        raise e
+    if workers > 1:
+        windows = run_concurrent(mode, batch_size, reconcile, summary["records_processed"], workers)
+    else:
+        windows = run_serial(mode, batch_size, reconcile, summary["records_processed"])
 
-    finally:
-        cur.close()
-        conn.close()
+    summary["watermarks"] = {table: describe(window) for table, window in windows.items()}
 
     with open("data/transformation_summary.json", "w") as f:
         json.dump(summary, f, indent=4)
@@ -251,4 +731,15 @@ def run_etl():
 # ENTRY POINT
 # -------------------------------
 if __name__ == "__main__":
-    run_etl()
+    parser = argparse.ArgumentParser(description="Cleanse staging data into the production schema")
+    parser.add_argument("--mode", choices=MODES, default=None,
+                        help="python: row-by-row in this process; sql: one INSERT ... SELECT per table "
+                             "(default: transformation.mode, else python)")
+    parser.add_argument("--reconcile", action="store_true",
+                        help="Ignore the fact watermarks and anti-join all of staging against production "
+                             "(also runs on transformation.reconcile_day)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="> 1 runs independent table stages concurrently on pooled connections "
+                             "(default: transformation.workers, else 1)")
+    args = parser.parse_args()
+    run_etl(args.mode, args.reconcile, args.workers)
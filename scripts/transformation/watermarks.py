@@ -0,0 +1,129 @@
+from datetime import datetime
+
+# Fact table -> natural key that breaks loaded_at ties
+FACT_KEYS = {
+    "transactions": "transaction_id",
+    "transaction_items": "item_id",
+}
+
+# One row per fact table: the (loaded_at, key) position the last committed
+# run read up to. Staging is indexed on the same pair, so the next run's
+# range scan starts right after it instead of re-reading history.
+PIPELINE_STATE_DDL = """
+    CREATE TABLE IF NOT EXISTS production.pipeline_state (
+        table_name VARCHAR(50) PRIMARY KEY,
+        last_loaded_at TIMESTAMP NOT NULL,
+        last_key VARCHAR(20) NOT NULL,
+        last_run_mode VARCHAR(20) NOT NULL,
+        rows_processed BIGINT NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX IF NOT EXISTS idx_staging_transactions_loaded
+        ON staging.transactions (loaded_at, transaction_id);
+    CREATE INDEX IF NOT EXISTS idx_staging_items_loaded
+        ON staging.transaction_items (loaded_at, item_id);
+"""
+
+# -------------------------------
+# Watermarks
+# -------------------------------
+def read_watermark(cur, table):
+    cur.execute("""
+        SELECT last_loaded_at, last_key FROM production.pipeline_state WHERE table_name = %s
+    """, (table,))
+    return cur.fetchone()
+
+# The newest staging row when the run starts. Reads stop there, so rows
+# landing mid-run are left whole for the next run
+def high_water_mark(cur, table):
+    key = FACT_KEYS[table]
+    cur.execute(f"""
+        SELECT loaded_at, {key} FROM staging.{table}
+        WHERE loaded_at IS NOT NULL
+        ORDER BY loaded_at DESC, {key} DESC
+        LIMIT 1
+    """)
+    return cur.fetchone()
+
+def save_watermark(cur, table, mark, mode, rows):
+    cur.execute("""
+        INSERT INTO production.pipeline_state
+        (table_name, last_loaded_at, last_key, last_run_mode, rows_processed, updated_at)
+        VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (table_name) DO UPDATE SET
+            last_loaded_at = EXCLUDED.last_loaded_at,
+            last_key = EXCLUDED.last_key,
+            last_run_mode = EXCLUDED.last_run_mode,
+            rows_processed = EXCLUDED.rows_processed,
+            updated_at = CURRENT_TIMESTAMP
+    """, (table, mark[0], mark[1], mode, rows))
+
+# Both fact tables' high-water marks in one statement, so from one snapshot.
+# Items are ingested after their transactions, so an item inside its window
+# always finds its transaction inside the transactions window, not past it
+def high_water_marks(cur):
+    cur.execute(" UNION ALL ".join(
+        f"""(SELECT '{table}', loaded_at, {key} FROM staging.{table}
+             WHERE loaded_at IS NOT NULL
+             ORDER BY loaded_at DESC, {key} DESC
+             LIMIT 1)"""
+        for table, key in FACT_KEYS.items()
+    ))
+    return {table: (loaded_at, key) for table, loaded_at, key in cur.fetchall()}
+
+# -------------------------------
+# Read Window
+# -------------------------------
+# Incremental runs read the staging rows between the stored watermark and
+# the current high-water mark. A reconcile run, or the first run of a table,
+# puts no bound on staging at all and leans on the anti-join against
+# production alone: it picks up anything an incremental run could miss (a
+# row committed late with an older loaded_at, or one with no loaded_at).
+# Either way the watermark then moves to the high-water mark, in the same
+# transaction as the rows it covers.
+def build_window(table, start, end):
+    window = {
+        "mode": "incremental" if start else "reconcile",
+        "start": start,
+        "end": end,
+        "sql": "",
+        "params": None
+    }
+
+    if start and end:
+        key = FACT_KEYS[table]
+        window["sql"] = (f"AND (s.loaded_at, s.{key}) > (%(start_at)s, %(start_key)s) "
+                         f"AND (s.loaded_at, s.{key}) <= (%(end_at)s, %(end_key)s)")
+        window["params"] = {"start_at": start[0], "start_key": start[1], "end_at": end[0], "end_key": end[1]}
+
+    return window
+
+def plan_window(cur, table, reconcile=False):
+    start = None if reconcile else read_watermark(cur, table)
+    return build_window(table, start, high_water_mark(cur, table))
+
+# Every fact window of a run, planned before any stage starts: a window
+# planned after its parent stage ran could take in items whose transactions
+# landed after the transactions window closed
+def plan_windows(cur, reconcile=False):
+    marks = high_water_marks(cur)
+    return {
+        table: build_window(table, None if reconcile else read_watermark(cur, table), marks.get(table))
+        for table in FACT_KEYS
+    }
+
+def close_window(cur, table, window, rows):
+    if window["end"]:
+        save_watermark(cur, table, window["end"], window["mode"], rows)
+
+def describe(window):
+    def position(mark):
+        if not mark:
+            return None
+        at, key = mark
+        return {"loaded_at": at.isoformat() if isinstance(at, datetime) else at, "key": key}
+
+    return {"mode": window["mode"], "from": position(window["start"]), "to": position(window["end"])}
+
+def reconcile_due(day, today=None):
+    return bool(day) and (today or datetime.now()).strftime("%A").lower() == str(day).lower()
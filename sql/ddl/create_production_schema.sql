@@ -12,6 +12,7 @@ CREATE TABLE IF NOT EXISTS production.customers (
     state VARCHAR(100),
     country VARCHAR(100),
     age_group VARCHAR(20),
+    row_hash CHAR(32),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -29,6 +30,9 @@ CREATE TABLE IF NOT EXISTS production.products (
     brand VARCHAR(100),
     stock_quantity INTEGER NOT NULL CHECK (stock_quantity >= 0),
     supplier_id VARCHAR(50),
+    profit_margin DECIMAL(7,2),
+    price_category VARCHAR(20),
+    row_hash CHAR(32),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CHECK (cost < price)
@@ -73,6 +77,18 @@ CREATE TABLE IF NOT EXISTS production.transaction_items (
         REFERENCES production.products(product_id)
 );
 
+-- =====================================================
+-- PRODUCTION: PIPELINE STATE (fact load watermarks)
+-- =====================================================
+CREATE TABLE IF NOT EXISTS production.pipeline_state (
+    table_name VARCHAR(50) PRIMARY KEY,
+    last_loaded_at TIMESTAMP NOT NULL,
+    last_key VARCHAR(20) NOT NULL,
+    last_run_mode VARCHAR(20) NOT NULL,
+    rows_processed BIGINT NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =====================================================
 -- INDEXES FOR PERFORMANCE
 -- =====================================================
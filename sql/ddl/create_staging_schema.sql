@@ -65,3 +65,12 @@ CREATE TABLE IF NOT EXISTS staging.transaction_items (
     line_total DECIMAL(12,2),
     loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
+
+-- =====================================================
+-- INDEXES FOR WATERMARK READS
+-- =====================================================
+CREATE INDEX IF NOT EXISTS idx_staging_transactions_loaded
+    ON staging.transactions (loaded_at, transaction_id);
+
+CREATE INDEX IF NOT EXISTS idx_staging_items_loaded
+    ON staging.transaction_items (loaded_at, item_id);
@@ -16,7 +16,8 @@ CREATE TABLE warehouse.dim_customers (
     registration_date DATE,
     effective_date DATE,
     end_date DATE,
-    is_current BOOLEAN
+    is_current BOOLEAN,
+    row_hash CHAR(32)
 );
 
 -- =========================
@@ -32,7 +33,8 @@ CREATE TABLE warehouse.dim_products (
     price_range VARCHAR(20),
     effective_date DATE,
     end_date DATE,
-    is_current BOOLEAN
+    is_current BOOLEAN,
+    row_hash CHAR(32)
 );
 
 -- =========================
@@ -62,10 +64,12 @@ CREATE TABLE warehouse.dim_payment_method (
 );
 
 -- =========================
--- FACT SALES
+-- FACT SALES (monthly range partitions on date_key)
 -- =========================
+-- Partitions (fact_sales_YYYY_MM) are created ahead of the loads and
+-- dropped for retention by scripts/transformation/fact_partitions.py
 CREATE TABLE warehouse.fact_sales (
-    sales_key BIGSERIAL PRIMARY KEY,
+    sales_key BIGSERIAL,
     date_key INTEGER NOT NULL,
     customer_key INTEGER NOT NULL,
     product_key INTEGER NOT NULL,
@@ -78,18 +82,36 @@ CREATE TABLE warehouse.fact_sales (
     profit DECIMAL(10,2),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
+    PRIMARY KEY (sales_key, date_key),
     FOREIGN KEY (date_key) REFERENCES warehouse.dim_date(date_key),
     FOREIGN KEY (customer_key) REFERENCES warehouse.dim_customers(customer_key),
     FOREIGN KEY (product_key) REFERENCES warehouse.dim_products(product_key),
     FOREIGN KEY (payment_method_key) REFERENCES warehouse.dim_payment_method(payment_method_key)
-);
+) PARTITION BY RANGE (date_key);
 
 -- INDEXES
+-- One current version per natural key; also the SCD2 merge's lookup path
+CREATE UNIQUE INDEX idx_dim_customers_current ON warehouse.dim_customers(customer_id) WHERE is_current;
+CREATE UNIQUE INDEX idx_dim_products_current ON warehouse.dim_products(product_id) WHERE is_current;
+-- Declared on the parent, built on every partition
 CREATE INDEX idx_fact_date ON warehouse.fact_sales(date_key);
 CREATE INDEX idx_fact_customer ON warehouse.fact_sales(customer_key);
 CREATE INDEX idx_fact_product ON warehouse.fact_sales(product_key);
 CREATE INDEX idx_fact_payment ON warehouse.fact_sales(payment_method_key);
 
+-- =========================
+-- FACT LOAD LEDGER (one row per loaded transaction date)
+-- =========================
+CREATE TABLE warehouse.fact_load_ledger (
+    transaction_date DATE PRIMARY KEY,
+    date_key INTEGER NOT NULL,
+    source_rows BIGINT NOT NULL,
+    signature CHAR(32) NOT NULL,
+    rows_loaded BIGINT NOT NULL,
+    source_loaded_at TIMESTAMP,
+    loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
 -- =========================
 -- AGGREGATE TABLES
 -- =========================
@@ -106,7 +128,10 @@ CREATE TABLE warehouse.agg_product_performance (
     total_quantity_sold INTEGER,
     total_revenue DECIMAL(12,2),
     total_profit DECIMAL(12,2),
-    avg_discount_percentage DECIMAL(5,2)
+    avg_discount_percentage DECIMAL(5,2),
+    discount_sum DECIMAL(12,2),
+    discount_count BIGINT,
+    sales_rows BIGINT
 );
 
 CREATE TABLE warehouse.agg_customer_metrics (
@@ -114,5 +139,6 @@ CREATE TABLE warehouse.agg_customer_metrics (
     total_transactions INTEGER,
     total_spent DECIMAL(12,2),
     avg_order_value DECIMAL(12,2),
-    last_purchase_date DATE
+    last_purchase_date DATE,
+    order_lines BIGINT
 );
@@ -1,3 +1,8 @@
+-- warehouse.fact_sales is partitioned by month on date_key. These queries
+-- cover all history and so read every partition; bound f.date_key
+-- (e.g. f.date_key >= 20240101 AND f.date_key < 20240401) to read only
+-- the months in range.
+
 /* =====================================================
 Query 1: Top 10 Products by Revenue
 Purpose: Identify best-selling products
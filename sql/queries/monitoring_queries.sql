@@ -14,7 +14,9 @@ SELECT
 FROM warehouse.fact_sales f
 JOIN warehouse.dim_date d
   ON f.date_key = d.date_key
-WHERE d.full_date >= CURRENT_DATE - INTERVAL '30 days'
+-- The date_key bound lets the planner prune fact_sales to the recent partitions
+WHERE f.date_key >= to_char(CURRENT_DATE - 30, 'YYYYMMDD')::INTEGER
+  AND d.full_date >= CURRENT_DATE - INTERVAL '30 days'
 GROUP BY d.full_date
 ORDER BY d.full_date;
 
@@ -0,0 +1,22 @@
+from scripts.transformation.aggregates import NO_FACT_ROWS, merge_aggregates, rebuild_aggregates
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append(" ".join(sql.split()))
+
+def test_rebuild_runs_the_merge_statements_over_all_facts():
+    merged, rebuilt = RecordingCursor(), RecordingCursor()
+    merge_aggregates(merged)
+    rebuild_aggregates(rebuilt)
+
+    # Rebuild: add the pair columns, empty the three tables, then merge
+    merge_part = rebuilt.statements[4:]
+    assert [s.split()[0] for s in rebuilt.statements[1:4]] == ["DELETE"] * 3
+    assert merge_part == [
+        s.replace("fact_added AS", "warehouse.fact_sales AS").replace("fact_removed AS", f"{NO_FACT_ROWS} AS")
+        for s in merged.statements
+    ]
+    assert any("COALESCE(SUM(profit), 0)" in s for s in merge_part)
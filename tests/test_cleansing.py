@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from decimal import Decimal
+
+from scripts.transformation.cleansing import (
+    calculate_profit_margin,
+    calculate_profit_margin_batch,
+    normalize_email_batch,
+    normalize_phone,
+    normalize_text,
+    normalize_text_batch,
+    price_category,
+    price_category_batch,
+    round_cents,
+    title_case_batch,
+)
+
+def test_batch_text_cleansing_matches_scalar():
+    cities = pd.Series(["  new york ", "", None, "  new york ", "boston", "  "])
+
+    batch = normalize_text_batch(cities)
+    assert list(batch) == [normalize_text(v) for v in cities]
+    assert list(batch) == ["new york", None, None, "new york", "boston", ""]
+
+    assert list(title_case_batch(batch)) == ["New York", None, None, "New York", "Boston", None]
+    assert list(normalize_email_batch([" A@X.COM ", None])) == ["a@x.com", None]
+    assert normalize_phone("(555) 010-9999 x12") == "555010999912"
+
+def test_batch_enrichment_uses_array_rules():
+    prices = np.array([10.0, 49.99, 50.0, 199.99, 200.0, 0.0])
+    costs = np.array([5.0, 40.0, 25.0, 100.0, 150.0, 1.0])
+
+    assert list(price_category_batch(prices)) == ["Budget", "Budget", "Mid-range", "Mid-range", "Premium", "Budget"]
+    assert price_category(None) is None
+
+    margins = calculate_profit_margin_batch(prices, costs)
+    assert list(margins[:5]) == [Decimal(m) for m in ("50.00", "19.98", "50.00", "50.00", "25.00")]
+    assert margins[5] is None
+    assert calculate_profit_margin(0, 1) is None and calculate_profit_margin(10.0, 5.0) == Decimal("50.00")
+
+def test_profit_margin_rounds_ties_like_the_decimal_baseline():
+    price, cost = Decimal("64.00"), Decimal("44.88")
+
+    # The pre-batch implementation, on the Decimals psycopg2 returns
+    baseline = round(((price - cost) / price) * 100, 2)
+
+    scalar = calculate_profit_margin(price, cost)
+    assert scalar == calculate_profit_margin_batch([price], [cost])[0] == baseline == Decimal("29.88")
+    assert isinstance(scalar, Decimal)
+
+def test_round_cents_rounds_half_up_like_sql():
+    # round(numeric, 2) in Postgres; round(Decimal, 2) would give 2.12
+    assert round_cents(Decimal("2.125")) == Decimal("2.13")
+    assert round_cents(19.999) == Decimal("20.00")
+    assert round_cents(None) is None
@@ -33,3 +33,182 @@ def test_referential_integrity_transactions():
     customers = pd.read_csv(f"{DATA_DIR}/customers.csv")
     transactions = pd.read_csv(f"{DATA_DIR}/transactions.csv")
     assert set(transactions["customer_id"]).issubset(set(customers["customer_id"]))
+
+def test_vectorized_items_match_schema_and_rollup(tmp_path):
+    import numpy as np
+    from scripts.data_generation.value_pools import load_pools
+    from scripts.data_generation.generate_data import (
+        calculate_total_amount,
+        generate_customers,
+        generate_products,
+        generate_transaction_items,
+        generate_transactions,
+    )
+
+    rng = np.random.default_rng(42)
+    pools = load_pools(size=200, seed=1, cache_dir=str(tmp_path))
+    customers = generate_customers(20, pools=pools)
+    products = generate_products(10, pools=pools)
+    transactions = generate_transactions(200, customers, rng, pools=pools)
+    items = generate_transaction_items(transactions, products, rng)
+    transactions = calculate_total_amount(transactions, items)
+
+    assert list(transactions.columns) == [
+        "transaction_id", "customer_id", "transaction_date", "transaction_time",
+        "payment_method", "shipping_address", "total_amount"
+    ]
+    assert list(items.columns) == [
+        "item_id", "transaction_id", "product_id", "quantity",
+        "unit_price", "discount_percentage", "line_total"
+    ]
+    assert items["item_id"].is_unique
+    assert not items.duplicated(["transaction_id", "product_id"]).any()
+    assert items.groupby("transaction_id").size().between(1, 5).all()
+
+    expected = (items["quantity"] * items["unit_price"] * (1 - items["discount_percentage"] / 100)).round(2)
+    assert np.allclose(items["line_total"], expected)
+
+    totals = items.groupby("transaction_id")["line_total"].sum().round(2)
+    assert np.allclose(transactions.set_index("transaction_id")["total_amount"], totals)
+
+def test_streaming_chunks_match_single_pass_rules(tmp_path):
+    from scripts.data_generation.generate_data import CsvSink, generate_streaming
+
+    config = {"data_generation": {"customers": 30, "products": 12, "transactions": 250,
+                                  "value_pools": {"size": 200, "cache_dir": str(tmp_path / "pools")}}}
+    metadata = generate_streaming(config, CsvSink(tmp_path), chunk_size=40)
+
+    transactions = pd.read_csv(tmp_path / "transactions.csv")
+    items = pd.read_csv(tmp_path / "transaction_items.csv")
+
+    assert len(transactions) == 250
+    assert transactions["transaction_id"].is_unique
+    assert items["item_id"].is_unique
+    assert metadata["record_counts"]["transaction_items"] == len(items)
+    assert metadata["data_quality"]["orphan_records"] == 0
+
+    totals = items.groupby("transaction_id")["line_total"].sum().round(2)
+    assert (transactions.set_index("transaction_id")["total_amount"] - totals).abs().max() < 0.005
+
+def test_sharded_output_is_deterministic_across_worker_counts(tmp_path):
+    from datetime import date
+    from scripts.data_generation.generate_data import TABLES, CsvSink, generate_sharded, generate_streaming
+
+    config = {"data_generation": {"customers": 25, "products": 15, "transactions": 120,
+                                  "value_pools": {"size": 200, "cache_dir": str(tmp_path / "pools")}}}
+    single, sharded = tmp_path / "single", tmp_path / "sharded"
+    single.mkdir()
+    sharded.mkdir()
+
+    streamed = generate_streaming(config, CsvSink(single), chunk_size=30, seed=7, as_of=date(2025, 6, 30))
+    merged = generate_sharded(config, 2, chunk_size=30, seed=7, as_of=date(2025, 6, 30), output_dir=sharded)
+
+    for table in TABLES:
+        assert (single / f"{table}.csv").read_bytes() == (sharded / f"{table}.csv").read_bytes()
+    assert streamed["record_counts"] == merged["record_counts"]
+    assert merged["generation_settings"]["shards"] == 4
+    assert not (sharded / "shards").exists()
+
+
+def test_value_pools_are_cached_and_emails_unique(tmp_path):
+    import numpy as np
+    from scripts.data_generation.value_pools import cache_path, load_pools
+    from scripts.data_generation.generate_data import generate_customers
+
+    pools = load_pools(size=50, seed=3, cache_dir=str(tmp_path))
+    assert cache_path(50, 3, str(tmp_path)).exists()
+
+    load_pools.cache_clear()
+    assert list(load_pools(size=50, seed=3, cache_dir=str(tmp_path))["cities"]) == list(pools["cities"])
+
+    customers = generate_customers(500, rng=np.random.default_rng(0), pools=pools)
+    assert customers["email"].is_unique
+    assert customers["email"].str.match(r"[^@]+@[^@]+\.[^@]+").all()
+
+def test_sharded_generation_feeds_a_sink_in_chunk_order(tmp_path):
+    from datetime import date
+    from scripts.data_generation.generate_data import TABLES, CsvSink, TeeSink, generate_sharded, generate_streaming
+
+    config = {"data_generation": {"customers": 25, "products": 15, "transactions": 90,
+                                  "value_pools": {"size": 200, "cache_dir": str(tmp_path / "pools")}}}
+    streamed, teed = tmp_path / "streamed", tmp_path / "teed"
+    streamed.mkdir()
+    teed.mkdir()
+
+    generate_streaming(config, CsvSink(streamed), chunk_size=20, seed=11, as_of=date(2025, 1, 31))
+    generate_sharded(config, 2, chunk_size=20, seed=11, as_of=date(2025, 1, 31),
+                     output_dir=tmp_path, sink=TeeSink(CsvSink(teed)))
+
+    for table in TABLES:
+        assert (streamed / f"{table}.csv").read_bytes() == (teed / f"{table}.csv").read_bytes()
+    assert not (tmp_path / "shards").exists()
+
+def test_skewed_profile_concentrates_hot_keys_and_weekends(tmp_path):
+    import numpy as np
+    from scripts.data_generation.value_pools import load_pools
+    from scripts.data_generation.workload_profiles import resolve_profile
+    from scripts.data_generation.generate_data import (
+        generate_customers,
+        generate_products,
+        generate_transaction_items,
+        generate_transactions,
+    )
+
+    config = {"data_generation": {
+        "profile": "skewed",
+        "workload_profiles": {"skewed": {
+            "customers": {"distribution": "zipf", "exponent": 1.2},
+            "products": {"distribution": "zipf", "exponent": 1.2},
+            "daily_volume": {"distribution": "seasonal", "weekday_weights": [1, 1, 1, 1, 1, 4, 4]}
+        }}
+    }}
+    profile = resolve_profile(config)
+    rng = np.random.default_rng(5)
+    pools = load_pools(size=100, seed=1, cache_dir=str(tmp_path))
+
+    customers = generate_customers(1000, rng=rng, pools=pools)
+    products = generate_products(200, rng=rng, pools=pools)
+    transactions = generate_transactions(20000, customers, rng, pools=pools, profile=profile)
+    items = generate_transaction_items(transactions, products, rng, profile=profile)
+
+    top_customers = transactions["customer_id"].value_counts().head(10).sum()
+    assert top_customers > 0.25 * len(transactions)
+    assert items["product_id"].value_counts().head(10).sum() > 0.2 * len(items)
+    assert not items.duplicated(["transaction_id", "product_id"]).any()
+
+    weekend_share = (pd.to_datetime(transactions["transaction_date"]).dt.dayofweek >= 5).mean()
+    assert weekend_share > 0.5
+
+def test_compressed_output_matches_plain_when_decompressed(tmp_path):
+    import gzip
+    from datetime import date
+    from scripts.data_generation.generate_data import TABLES, CsvSink, generate_sharded, generate_streaming
+
+    config = {"data_generation": {"customers": 20, "products": 10, "transactions": 60,
+                                  "value_pools": {"size": 200, "cache_dir": str(tmp_path / "pools")}}}
+    plain, packed = tmp_path / "plain", tmp_path / "packed"
+    plain.mkdir()
+    packed.mkdir()
+
+    generate_streaming(config, CsvSink(plain), chunk_size=25, seed=5, as_of=date(2025, 3, 31))
+    generate_sharded(config, 2, chunk_size=25, seed=5, as_of=date(2025, 3, 31),
+                     output_dir=packed, compression="gzip")
+
+    for table in TABLES:
+        assert gzip.decompress((packed / f"{table}.csv.gz").read_bytes()) == (plain / f"{table}.csv").read_bytes()
+
+def test_default_cli_run_is_reproducible_from_seed(tmp_path, monkeypatch):
+    from scripts.data_generation import generate_data
+    from scripts.data_generation.generate_data import TABLES, main
+
+    config = {"data_generation": {"customers": 15, "products": 8, "transactions": 40,
+                                  "value_pools": {"size": 200, "cache_dir": str(tmp_path / "pools")}}}
+    monkeypatch.setattr(generate_data, "load_config", lambda: config)
+
+    runs = []
+    for run in ("first", "second"):
+        monkeypatch.setattr(generate_data, "RAW_DATA_DIR", tmp_path / run)
+        main(["--seed", "11", "--as-of", "2025-01-31"])
+        runs.append({table: (tmp_path / run / f"{table}.csv").read_bytes() for table in TABLES})
+
+    assert runs[0] == runs[1]
@@ -26,3 +26,256 @@ def test_warehouse_tables_exist(db_available):
     assert "fact_sales" in tables
     assert "dim_customers" in tables
     conn.close()
+
+def test_binary_copy_encodes_numeric_and_dates():
+    import io
+    import struct
+    from scripts.ingestion.binary_copy import BinaryCopyStream, PGCOPY_HEADER, encode_date, encode_numeric
+
+    # 123.45 -> base-10000 groups [123, 4500], weight 0, positive, dscale 2
+    assert encode_numeric("123.45") == struct.pack("!hhHh2H", 2, 0, 0, 2, 123, 4500)
+    assert encode_numeric("0") == struct.pack("!hhHh", 0, 0, 0, 0)
+    assert encode_date("2000-01-02") == struct.pack("!i", 1)
+
+    stream = BinaryCopyStream(io.BytesIO(b"a,1.5\nb,\n"), [lambda v: v.encode(), encode_numeric])
+    data = b"".join(iter(lambda: stream.read(7), b""))
+    assert stream.rows == 2
+    assert data.startswith(PGCOPY_HEADER) and data.endswith(struct.pack("!h", -1))
+    assert struct.pack("!i", -1) in data
+
+def test_split_ranges_end_on_line_boundaries():
+    import io
+    from scripts.ingestion.ingest_to_staging import CountingReader, split_ranges
+
+    data = b"id,name\n" + b"".join(f"{i},row{i}\n".encode() for i in range(100))
+    f = io.BytesIO(data)
+    ranges = split_ranges(f, 4)
+
+    assert len(ranges) == 4
+    assert ranges[0][0] == len(b"id,name\n") and ranges[-1][1] == len(data)
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+
+    chunks = []
+    for start, end in ranges:
+        f.seek(start)
+        chunks.append(CountingReader(f, limit=end - start).read())
+    assert b"".join(chunks) == data[len(b"id,name\n"):]
+
+class RecordingCursor:
+    checkpoint = None
+    indexes = []
+
+    def __init__(self, log):
+        self.log = log
+        self.rowcount = -1
+
+    def fetchone(self):
+        return RecordingCursor.checkpoint
+
+    def fetchall(self):
+        return RecordingCursor.indexes
+
+    def execute(self, sql, params=None):
+        self.log.append(" ".join(sql.split()))
+
+    def copy_expert(self, sql, f, size=8192):
+        self.log.append(sql)
+        self.rowcount = sum(1 for _ in iter(f.readline, b""))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class RecordingPool:
+    # Like ThreadedConnectionPool, raises instead of waiting once maxconn are out
+    def __init__(self, minconn=1, maxconn=None, **kwargs):
+        import threading
+        self.log = RecordingPool.log = []
+        self.maxconn = maxconn
+        self.in_use = 0
+        self.lock = threading.Lock()
+
+    def getconn(self):
+        from psycopg2.pool import PoolError
+        with self.lock:
+            if self.maxconn is not None and self.in_use >= self.maxconn:
+                raise PoolError("connection pool exhausted")
+            self.in_use += 1
+        return self
+
+    def putconn(self, conn):
+        with self.lock:
+            self.in_use -= 1
+
+    def closeall(self):
+        pass
+
+    def close(self):
+        pass
+
+    def cursor(self):
+        return RecordingCursor(self.log)
+
+    def commit(self):
+        self.log.append("COMMIT")
+
+    def rollback(self):
+        self.log.append("ROLLBACK")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+def test_parallel_ingestion_publishes_chunked_tables(tmp_path, monkeypatch):
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    for config in ingest.TABLES.values():
+        rows = 50 if config["file"] == "transactions.csv" else 3
+        (tmp_path / config["file"]).write_text("id,value\n" + "".join(f"{i},x\n" for i in range(rows)))
+
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(ingest, "ThreadedConnectionPool", RecordingPool)
+
+    loaded = ingest.ingest_parallel(ingest.TABLES, "csv", workers=3, split_bytes=100)
+
+    assert loaded["staging.transactions"]["rows_loaded"] == 50
+    assert loaded["staging.transactions"]["chunks"] > 1
+    assert loaded["staging.customers"]["rows_loaded"] == 3
+    assert "INSERT INTO public.transactions SELECT * FROM public.transactions_load" in RecordingPool.log
+    assert not any("customers_load" in sql for sql in RecordingPool.log)
+
+def test_parallel_ingestion_never_exhausts_the_pool(tmp_path, monkeypatch):
+    import time
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    for config in ingest.TABLES.values():
+        rows = 40 if config["file"] == "customers.csv" else 3
+        (tmp_path / config["file"]).write_text("id,value\n" + "".join(f"{i},x\n" for i in range(rows)))
+
+    # Slow COPYs keep every worker holding a connection while chunks are pending
+    copy_expert = RecordingCursor.copy_expert
+    def slow_copy(self, sql, f, size=8192):
+        time.sleep(0.05)
+        copy_expert(self, sql, f, size)
+
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(ingest, "ThreadedConnectionPool", RecordingPool)
+    monkeypatch.setattr(RecordingCursor, "copy_expert", slow_copy)
+
+    loaded = ingest.ingest_parallel(ingest.TABLES, "csv", workers=2, split_bytes=60)
+
+    assert loaded["staging.customers"]["rows_loaded"] == 40
+    assert loaded["staging.customers"]["chunks"] > 2
+    assert all(stats["status"] != "failed" for stats in loaded.values())
+
+def test_resumable_ingestion_continues_from_checkpoint(tmp_path, monkeypatch):
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    header = b"id,value\n"
+    lines = [f"{i},x\n".encode() for i in range(10)]
+    (tmp_path / "transactions.csv").write_bytes(header + b"".join(lines))
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+
+    # Four rows were committed by the failed run
+    conn = RecordingPool()
+    monkeypatch.setattr(RecordingCursor, "checkpoint", (len(header) + sum(map(len, lines[:4])), 4))
+    stats = ingest.load_table_resumable(conn, "transactions", ingest.TABLES["transactions"], "csv", batch_rows=4)
+
+    assert stats["resumed_from_row"] == 4
+    assert stats["rows_loaded"] == 10
+    assert not any(sql.startswith("TRUNCATE") for sql in conn.log)
+    assert sum(sql.startswith("COPY") for sql in conn.log) == 2
+
+def test_resumable_failure_lists_the_tables_not_attempted(monkeypatch):
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    def load(conn, table, config, copy_format, batch_rows):
+        if table == "products":
+            raise RuntimeError("bad row")
+        return {"rows_loaded": 1, "status": "success"}
+
+    monkeypatch.setattr(ingest, "get_connection", RecordingPool)
+    monkeypatch.setattr(ingest, "load_table_resumable", load)
+
+    loaded = ingest.ingest_resumable(ingest.TABLES, "csv", batch_rows=10)
+
+    assert list(loaded) == [f"staging.{t}" for t in ingest.TABLES]
+    assert loaded["staging.products"]["status"] == "failed"
+    assert loaded["staging.transaction_items"]["status"] == "not_attempted"
+
+def test_manifest_skips_unchanged_files(tmp_path, monkeypatch):
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    for config in ingest.TABLES.values():
+        (tmp_path / config["file"]).write_text("id\n1\n2\n")
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(ingest, "staging_row_count", lambda cur, table: 2)
+
+    to_load, skipped, entries = ingest.plan_tables(None, {})
+    assert set(to_load) == set(ingest.TABLES) and not skipped
+
+    loaded = {f"staging.{t}": {"rows_loaded": 2, "status": "success"} for t in to_load}
+    manifest = ingest.update_manifest({}, entries, loaded)
+    assert loaded["staging.customers"]["action"] == "loaded"
+
+    (tmp_path / "products.csv").write_text("id\n1\n3\n")
+    to_load, skipped, entries = ingest.plan_tables(None, manifest)
+    assert list(to_load) == ["products"]
+    assert skipped["staging.customers"]["status"] == "skipped"
+
+def test_compressed_raw_files_stream_into_copy(tmp_path):
+    import bz2
+    import gzip
+    from scripts.ingestion import ingest_to_staging as ingest
+    from scripts.ingestion.compression import find_raw_file
+
+    body = b"id,value\n" + b"".join(f"{i},x\n".encode() for i in range(20))
+    (tmp_path / "customers.csv.gz").write_bytes(gzip.compress(body))
+    (tmp_path / "products.csv.bz2").write_bytes(bz2.compress(body))
+
+    for name in ("customers.csv", "products.csv"):
+        path = find_raw_file(str(tmp_path), name)
+        assert ingest.plan_ranges(path, split_bytes=10) is None
+
+        log = []
+        rows, bytes_read = ingest.copy_file(RecordingCursor(log), "customers", path)
+        assert rows == 20 and bytes_read == len(body)
+
+def test_shadow_load_indexes_then_swaps_with_canonical_names(tmp_path, monkeypatch):
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    for config in ingest.TABLES.values():
+        (tmp_path / config["file"]).write_text("id,value\n1,x\n2,y\n")
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(ingest, "ThreadedConnectionPool", RecordingPool)
+    monkeypatch.setattr(RecordingCursor, "indexes", [("pk", "CREATE UNIQUE INDEX pk ...", "pk", "PRIMARY KEY (id)")])
+
+    loaded = ingest.ingest_shadow({"customers": ingest.TABLES["customers"]}, "csv", workers=1, split_bytes=1024)
+    log = RecordingPool.log
+
+    assert loaded["staging.customers"]["rows_loaded"] == 2
+    assert log.index("ALTER TABLE public.customers_load ADD CONSTRAINT pk_load PRIMARY KEY (id)") \
+        < log.index("ALTER TABLE public.customers_load SET LOGGED") \
+        < log.index("ALTER TABLE public.customers_load RENAME TO customers") \
+        < log.index("DROP TABLE public.customers_old") \
+        < log.index("ALTER TABLE public.customers RENAME CONSTRAINT pk_load TO pk")
+
+def test_upsert_merges_each_batch_on_the_natural_key(tmp_path, monkeypatch):
+    from scripts.ingestion import ingest_to_staging as ingest
+
+    (tmp_path / "customers.csv").write_text("customer_id,email\n" + "".join(f"C{i},x\n" for i in range(10)))
+    monkeypatch.setattr(ingest, "DATA_PATH", str(tmp_path))
+
+    # Each batch: 5 rows, 4 distinct keys, 2 inserted, 1 updated
+    monkeypatch.setattr(RecordingCursor, "checkpoint", (5, 4, 2, 1))
+    conn = RecordingPool()
+    stats = ingest.load_table_upsert(conn, "customers", ingest.TABLES["customers"], "csv", batch_rows=5)
+
+    assert (stats["inserted"], stats["updated"], stats["unchanged"], stats["duplicates_in_file"]) == (4, 2, 2, 2)
+    merges = [sql for sql in conn.log if "ON CONFLICT (customer_id) DO UPDATE" in sql]
+    assert len(merges) == 2 and "email = EXCLUDED.email" in merges[0]
+    assert not any(sql.startswith("TRUNCATE TABLE public.customers ") for sql in conn.log)
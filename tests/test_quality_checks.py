@@ -8,3 +8,39 @@ def test_quality_score_present():
     with open("data/processed/monitoring_report.json") as f:
         report = json.load(f)
     assert "overall_health_score" in report
+
+def test_pre_ingest_validation_quarantines_bad_rows(tmp_path):
+    import pandas as pd
+    from datetime import date
+    from scripts.quality_checks.pre_ingest_validation import validate_raw_files
+
+    raw = tmp_path / "raw"
+    raw.mkdir()
+    (raw / "customers.csv").write_text(
+        "customer_id,email,registration_date\n"
+        "C1,a@x.com,2024-01-01\nC2,,2024-01-01\nC3,A@x.com,2024-01-01\nC1,b@x.com,2024-01-01\n")
+    (raw / "products.csv").write_text("product_id,price,cost\nP1,10,5\nP2,0,1\n")
+    (raw / "transactions.csv").write_text(
+        "transaction_id,customer_id,transaction_date,total_amount\n"
+        "T1,C1,2024-02-01,20\nT2,C2,2024-02-01,20\nT3,C1,2099-01-01,20\nT4,C1,2023-12-31,20\n")
+    (raw / "transaction_items.csv").write_text(
+        "item_id,transaction_id,product_id,quantity,unit_price,discount_percentage,line_total\n"
+        "I1,T1,P1,2,10,10,18\nI2,T1,P1,0,10,0,0\nI3,T1,P2,1,10,0,10\nI4,T2,P1,1,10,0,10\nI5,T1,P1,1,10,0,9\n")
+
+    report = validate_raw_files(str(raw), str(tmp_path / "clean"), str(tmp_path / "quarantine"),
+                                str(tmp_path / "report.json"), chunk_rows=2, today=date(2025, 1, 1))
+    checks = report["checks_performed"]
+
+    assert checks["null_checks"]["details"]["customers.email"] == 1
+    assert checks["duplicate_checks"]["details"] == {**checks["duplicate_checks"]["details"],
+                                                     "duplicate_customer_ids": 1, "duplicate_emails": 1}
+    assert checks["referential_integrity"]["details"]["transactions_without_customers"] == 1
+    assert checks["accuracy_business_rules"]["details"] == {"future_transactions": 1,
+                                                            "registration_after_transaction": 1}
+    assert checks["range_checks"]["details"]["invalid_quantities"] == 1
+    assert checks["data_consistency"]["mismatches"] == 1
+    assert report["quality_grade"] == "F"
+
+    assert list(pd.read_csv(tmp_path / "clean" / "transaction_items.csv")["item_id"]) == ["I1"]
+    quarantined = pd.read_csv(tmp_path / "quarantine" / "transaction_items.csv")
+    assert quarantined.set_index("item_id").loc["I4", "rejection_reasons"] == "orphan_transaction"
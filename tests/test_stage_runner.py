@@ -0,0 +1,37 @@
+import threading
+
+import pytest
+
+from scripts.transformation.stage_runner import STAGE_DEPENDENCIES, run_in_dependency_order
+
+def test_stages_start_after_their_dependencies():
+    finished = []
+    lock = threading.Lock()
+
+    def run(stage):
+        # Every parent must already be done when a stage starts
+        with lock:
+            assert all(p in finished for p in STAGE_DEPENDENCIES[stage])
+        with lock:
+            finished.append(stage)
+        return stage.upper()
+
+    results = run_in_dependency_order(run, STAGE_DEPENDENCIES, workers=2)
+    assert results == {stage: stage.upper() for stage in STAGE_DEPENDENCIES}
+    assert finished.index("transaction_items") == 3
+
+def test_failed_stage_stops_dependants():
+    started = []
+
+    def run(stage):
+        started.append(stage)
+        if stage == "customers":
+            raise RuntimeError("customers failed")
+
+    with pytest.raises(RuntimeError):
+        run_in_dependency_order(run, STAGE_DEPENDENCIES, workers=2)
+    assert "transactions" not in started and "transaction_items" not in started
+
+def test_unsatisfiable_dependencies_are_rejected():
+    with pytest.raises(ValueError):
+        run_in_dependency_order(lambda stage: None, {"a": ("b",), "b": ("a",)}, workers=2)
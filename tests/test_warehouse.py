@@ -39,3 +39,167 @@ def test_fact_table_has_surrogate_keys():
     cols = [r[0] for r in cur.fetchall()]
     assert "customer_key" in cols
     conn.close()
+
+def test_dim_date_covers_transactions_and_extends_only_edges():
+    from datetime import date
+    from scripts.transformation.load_warehouse import ensure_dim_date, missing_edges
+
+    assert missing_edges((date(2024, 1, 10), date(2024, 1, 20)), (date(2024, 1, 5), date(2024, 1, 25))) == [
+        (date(2024, 1, 5), date(2024, 1, 9)), (date(2024, 1, 21), date(2024, 1, 25))]
+
+    conn = get_connection()
+    try:
+        ensure_dim_date(conn, horizon_days=30)
+        assert ensure_dim_date(conn, horizon_days=30) == []
+
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COUNT(*) FROM public.transactions t
+            LEFT JOIN warehouse.dim_date d ON d.full_date = t.transaction_date
+            WHERE d.date_key IS NULL
+        """)
+        assert cur.fetchone()[0] == 0
+    finally:
+        conn.close()
+
+def test_scd2_merge_leaves_unchanged_rows_alone():
+    from scripts.transformation.load_dim_customers import CUSTOMER_ATTRIBUTES, CUSTOMER_SOURCE
+    from scripts.transformation.scd2 import merge_scd2
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        merge_scd2(cur, "dim_customers", "customer_id", CUSTOMER_ATTRIBUTES, CUSTOMER_SOURCE)
+        cur.execute("SELECT customer_id, customer_key FROM warehouse.dim_customers WHERE is_current")
+        keys = dict(cur.fetchall())
+
+        counts = merge_scd2(cur, "dim_customers", "customer_id", CUSTOMER_ATTRIBUTES, CUSTOMER_SOURCE)
+        cur.execute("SELECT customer_id, customer_key FROM warehouse.dim_customers WHERE is_current")
+        assert dict(cur.fetchall()) == keys
+    finally:
+        conn.rollback()
+        conn.close()
+
+    assert counts["new"] == counts["changed"] == 0
+
+def test_fact_reload_skips_unchanged_dates():
+    from scripts.transformation.load_fact_sales import LEDGER_DDL, plan_windows, record_windows, replace_windows
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(LEDGER_DDL)
+        plan_windows(cur)
+        replace_windows(cur)
+        record_windows(cur)
+        cur.execute("DROP TABLE fact_dimension_catchup, fact_candidate_dates, fact_source_signatures, fact_windows, "
+                    "fact_removed, fact_added")
+
+        # Nothing was ingested since, so no date is even fingerprinted
+        assert plan_windows(cur) == 0
+        cur.execute("SELECT COUNT(*) FROM fact_candidate_dates")
+        assert cur.fetchone()[0] == 0
+    finally:
+        conn.rollback()
+        conn.close()
+
+def test_short_dates_reload_only_once_their_dimensions_arrive():
+    from scripts.transformation.load_fact_sales import LEDGER_DDL, plan_windows
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(LEDGER_DDL)
+        cur.execute("SELECT transaction_date FROM warehouse.fact_load_ledger WHERE rows_loaded > 0 LIMIT 1")
+        row = cur.fetchone()
+        if row is None:
+            pytest.skip("No loaded fact dates")
+
+        # Short by a row whose dimensions are still missing: left alone
+        cur.execute("UPDATE warehouse.fact_load_ledger SET source_rows = rows_loaded + 1 WHERE transaction_date = %s",
+                    row)
+        plan_windows(cur)
+        cur.execute("SELECT COUNT(*) FROM fact_windows WHERE transaction_date = %s", row)
+        assert cur.fetchone()[0] == 0
+        cur.execute("DROP TABLE fact_dimension_catchup, fact_candidate_dates, fact_source_signatures, fact_windows")
+
+        # More rows join now than were loaded: reloaded
+        cur.execute("UPDATE warehouse.fact_load_ledger SET rows_loaded = rows_loaded - 1 WHERE transaction_date = %s",
+                    row)
+        plan_windows(cur)
+        cur.execute("SELECT COUNT(*) FROM fact_windows WHERE transaction_date = %s", row)
+        assert cur.fetchone()[0] == 1
+    finally:
+        conn.rollback()
+        conn.close()
+
+def test_fact_sales_prunes_to_monthly_partitions():
+    from datetime import date
+    from scripts.transformation.fact_partitions import ensure_partitions, existing_partitions, migrate_to_partitioned
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        migrate_to_partitioned(cur)
+        ensure_partitions(cur, date(2024, 1, 15), date(2024, 3, 2))
+        assert ensure_partitions(cur, date(2024, 1, 1), date(2024, 3, 31)) == []
+        assert {date(2024, m, 1) for m in (1, 2, 3)} <= set(existing_partitions(cur))
+
+        cur.execute("EXPLAIN SELECT COUNT(*) FROM warehouse.fact_sales WHERE date_key >= 20240301 AND date_key < 20240401")
+        plan = "\n".join(r[0] for r in cur.fetchall())
+        assert "fact_sales_2024_03" in plan and "fact_sales_2024_01" not in plan
+    finally:
+        conn.rollback()
+        conn.close()
+
+def aggregate_snapshot(cur):
+    tables = {}
+    for table, key in (("agg_daily_sales", "date_key"),
+                       ("agg_product_performance", "product_key"),
+                       ("agg_customer_metrics", "customer_key")):
+        cur.execute(f"SELECT * FROM warehouse.{table} ORDER BY {key}")
+        tables[table] = cur.fetchall()
+    return tables
+
+def test_merged_aggregates_match_full_rebuild():
+    from scripts.transformation.aggregates import merge_aggregate_deltas, rebuild_aggregates
+    from scripts.transformation.load_fact_sales import LEDGER_DDL, plan_windows, record_windows, replace_windows
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        rebuild_aggregates(cur)
+        cur.execute(LEDGER_DDL)
+        cur.execute("DELETE FROM warehouse.fact_load_ledger")
+        plan_windows(cur)
+        replace_windows(cur)
+        record_windows(cur)
+        assert merge_aggregate_deltas(cur) == "merged"
+        merged = aggregate_snapshot(cur)
+
+        rebuild_aggregates(cur)
+        assert aggregate_snapshot(cur) == merged
+    finally:
+        conn.rollback()
+        conn.close()
+
+def test_retention_drop_keeps_aggregates_in_step():
+    from scripts.transformation.aggregates import rebuild_aggregates
+    from scripts.transformation.fact_partitions import (drop_partitions_before, existing_partitions,
+                                                         migrate_to_partitioned, next_month)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    try:
+        migrate_to_partitioned(cur)
+        rebuild_aggregates(cur)
+        oldest = min(existing_partitions(cur))
+
+        assert drop_partitions_before(cur, next_month(oldest))
+        merged = aggregate_snapshot(cur)
+
+        rebuild_aggregates(cur)
+        assert aggregate_snapshot(cur) == merged
+    finally:
+        conn.rollback()
+        conn.close()
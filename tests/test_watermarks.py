@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from scripts.transformation.watermarks import describe, plan_window, plan_windows, reconcile_due
+
+class StateCursor:
+    # Answers the two watermark lookups in the order plan_window asks them
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.queries = []
+
+    def execute(self, query, params=None):
+        self.queries.append(query)
+
+    def fetchone(self):
+        return self.answers.pop(0)
+
+    def fetchall(self):
+        return self.answers.pop(0)
+
+def test_window_reads_only_rows_past_the_watermark():
+    start = (datetime(2024, 1, 1), "TXN00010")
+    end = (datetime(2024, 1, 2), "TXN00042")
+
+    window = plan_window(StateCursor(start, end), "transactions")
+    assert window["mode"] == "incremental"
+    assert "(s.loaded_at, s.transaction_id) >" in window["sql"]
+    assert window["params"] == {"start_at": start[0], "start_key": "TXN00010",
+                                "end_at": end[0], "end_key": "TXN00042"}
+    assert describe(window)["to"] == {"loaded_at": "2024-01-02T00:00:00", "key": "TXN00042"}
+
+def test_first_run_and_reconcile_scan_everything():
+    end = (datetime(2024, 1, 2), "I9")
+
+    first = plan_window(StateCursor(None, end), "transaction_items")
+    cursor = StateCursor(end)
+    forced = plan_window(cursor, "transaction_items", reconcile=True)
+
+    assert first["mode"] == forced["mode"] == "reconcile"
+    assert first["sql"] == forced["sql"] == ""
+    assert len(cursor.queries) == 1
+    assert reconcile_due("Sunday", datetime(2024, 1, 7)) and not reconcile_due("sunday", datetime(2024, 1, 8))
+
+def test_fact_windows_share_one_high_water_snapshot():
+    marks = [("transactions", datetime(2024, 1, 2), "TXN00042"),
+             ("transaction_items", datetime(2024, 1, 2), "I0099")]
+    cursor = StateCursor(marks, (datetime(2024, 1, 1), "TXN00010"), (datetime(2024, 1, 1), "I0050"))
+
+    windows = plan_windows(cursor)
+    assert "UNION ALL" in cursor.queries[0]
+    assert windows["transactions"]["end"] == (datetime(2024, 1, 2), "TXN00042")
+    assert windows["transaction_items"]["params"]["start_key"] == "I0050"
+    assert windows["transaction_items"]["params"]["end_key"] == "I0099"